@@ -0,0 +1,183 @@
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+# Each record is a header followed by its blob: magic, deleted flag, sha256 key, blob length
+RECORD = struct.Struct("<4sB32sI")
+MAGIC = b"MTA1"
+
+
+class PackedArchive:
+    """Append-only single-file blob store keyed by hex sha256, read through a memory map.
+
+    The file is a run of self-describing records, so the index is rebuilt by scanning it and a
+    torn write at the end is simply cut off. Deletes append a tombstone; compact() rewrites the
+    live records once enough space is dead.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._generation = 0  # Bumped by clear(), so a compaction running across it is thrown away
+        self._index = OrderedDict()  # key -> (blob offset, blob length), in file order
+        self.live_bytes = 0
+        self.dead_bytes = 0
+        self._mmap = None
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        self._file = open(path, "r+b")
+        self._scan()
+
+    def _scan(self):
+        size = os.fstat(self._file.fileno()).st_size
+        offset = 0
+        self._file.seek(0)
+        while offset + RECORD.size <= size:
+            magic, deleted, raw_key, length = RECORD.unpack(self._file.read(RECORD.size))
+            if magic != MAGIC or offset + RECORD.size + length > size:
+                break
+            key = raw_key.hex()
+            self._drop(key)
+            if deleted:
+                self.dead_bytes += RECORD.size
+            else:
+                self._index[key] = (offset + RECORD.size, length)
+                self.live_bytes += RECORD.size + length
+            offset += RECORD.size + length
+            self._file.seek(offset)
+        if offset < size:
+            self._file.truncate(offset)
+
+    def _drop(self, key):
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            self.live_bytes -= RECORD.size + entry[1]
+            self.dead_bytes += RECORD.size + entry[1]
+
+    def _append(self, key, deleted, blob):
+        self._file.seek(0, os.SEEK_END)
+        offset = self._file.tell()
+        self._file.write(RECORD.pack(MAGIC, deleted, bytes.fromhex(key), len(blob)) + blob)
+        self._file.flush()
+        return offset + RECORD.size
+
+    def keys(self):
+        with self._lock:
+            return list(self._index)
+
+    def size_of(self, key):
+        with self._lock:
+            entry = self._index.get(key)
+            return entry[1] if entry is not None else None
+
+    def get(self, key):
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            offset, length = entry
+            if self._mmap is None or offset + length > len(self._mmap):
+                self._remap()
+            # Copy out so no view into the map outlives a remap or compaction
+            return self._mmap[offset:offset + length]
+
+    def put(self, key, blob):
+        with self._lock:
+            self._drop(key)
+            offset = self._append(key, 0, blob)
+            self._index[key] = (offset, len(blob))
+            self.live_bytes += RECORD.size + len(blob)
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._index:
+                self._drop(key)
+                self._append(key, 1, b"")
+                self.dead_bytes += RECORD.size
+
+    def _remap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if os.fstat(self._file.fileno()).st_size:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _close_map(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def should_compact(self, max_dead_bytes):
+        return self.dead_bytes > max_dead_bytes
+
+    def compact(self, order=None):
+        """Rewrite only the live records, in `order` (oldest first) when given.
+
+        The copy runs outside the lock, from a map of the file as it stood, so reads and writes
+        carry on meanwhile; whatever was appended during it is carried over when the files swap.
+        """
+        with self._compact_lock:
+            with self._lock:
+                keys = [k for k in order if k in self._index] if order is not None else list(self._index)
+                seen = set(keys)
+                keys += [k for k in self._index if k not in seen]
+                entries = [(key, self._index[key]) for key in keys]
+                end = os.fstat(self._file.fileno()).st_size
+                generation = self._generation
+                if not end:
+                    return
+                source = mmap.mmap(self._file.fileno(), end, access=mmap.ACCESS_READ)
+
+            tmp_path = self.path + ".tmp"
+            copied = {}
+            try:
+                with open(tmp_path, "wb") as out:
+                    for key, (offset, length) in entries:
+                        out.write(RECORD.pack(MAGIC, 0, bytes.fromhex(key), length))
+                        copied[key] = out.tell()
+                        out.write(source[offset:offset + length])
+                    copied_end = out.tell()
+            finally:
+                source.close()
+
+            with self._lock:
+                if generation != self._generation or self._file.closed:
+                    os.remove(tmp_path)
+                    return
+                # Records appended during the copy are self-describing, so they move across as they are
+                size = os.fstat(self._file.fileno()).st_size
+                self._file.seek(end)
+                with open(tmp_path, "ab") as out:
+                    out.write(self._file.read(size - end))
+                index = OrderedDict()
+                for key, (offset, length) in entries:
+                    entry = self._index.get(key)
+                    if entry is not None and entry[0] < end:
+                        index[key] = (copied[key], length)
+                for key, (offset, length) in self._index.items():
+                    if offset >= end:
+                        index[key] = (copied_end + offset - end, length)
+                # Windows won't replace a file that is still open or mapped
+                self._close_map()
+                self._file.close()
+                os.replace(tmp_path, self.path)
+                self._file = open(self.path, "r+b")
+                self._index = index
+                self.dead_bytes = copied_end + size - end - self.live_bytes
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._close_map()
+            self._file.truncate(0)
+            self._index.clear()
+            self.live_bytes = 0
+            self.dead_bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._close_map()
+            self._file.close()
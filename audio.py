@@ -0,0 +1,67 @@
+import io
+import struct
+
+import numpy as np
+
+PCM_SCALE = 1.0 / 32768.0
+
+
+def decode_wav(wav_bytes):
+    """Parse a 16-bit PCM WAV held in memory into an int16 array without copying the samples."""
+    if len(wav_bytes) < 12 or wav_bytes[:4] != b"RIFF" or wav_bytes[8:12] != b"WAVE":
+        raise ValueError("Not a RIFF/WAVE buffer")
+
+    channels = fs = bits = None
+    offset = 12
+    end = len(wav_bytes)
+    while offset + 8 <= end:
+        chunk_id, size = struct.unpack_from("<4sI", wav_bytes, offset)
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            audio_format, channels, fs, _, _, bits = struct.unpack_from("<HHIIHH", wav_bytes, body)
+            if audio_format == 0xFFFE and size >= 40:
+                # WAVE_FORMAT_EXTENSIBLE keeps the real format in the sub-format GUID
+                audio_format = struct.unpack_from("<H", wav_bytes, body + 24)[0]
+            if audio_format != 1 or bits != 16:
+                raise ValueError(f"Unsupported WAV format {audio_format} with {bits} bits per sample")
+        elif chunk_id == b"data":
+            if fs is None:
+                raise ValueError("WAV data chunk found before fmt chunk")
+            # Streamed WAVs may carry a placeholder size, so trust the buffer length instead
+            size = min(size, end - body)
+            frame_bytes = 2 * channels
+            samples = np.frombuffer(wav_bytes, dtype="<i2", count=(size // frame_bytes) * channels, offset=body)
+            if channels > 1:
+                samples = samples.reshape(-1, channels)
+            return samples, fs
+        offset = body + size + (size & 1)
+    raise ValueError("WAV buffer has no data chunk")
+
+
+def encode_wav(samples, fs):
+    samples = np.ascontiguousarray(samples, dtype="<i2")
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    data_size = samples.nbytes
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, channels, fs, fs * channels * 2, channels * 2, 16,
+        b"data", data_size,
+    )
+    return header + samples.tobytes()
+
+
+def encode_opus(samples, fs):
+    """Compress int16 PCM to Ogg Opus, roughly a tenth the size of the WAV."""
+    import soundfile as sf
+    out = io.BytesIO()
+    sf.write(out, samples, fs, format="OGG", subtype="OPUS")
+    return out.getvalue()
+
+
+def decode_audio(blob):
+    """Decode a WAV or Ogg blob to (int16 samples, fs), telling them apart by their magic bytes."""
+    if blob[:4] == b"OggS":
+        import soundfile as sf
+        return sf.read(io.BytesIO(blob), dtype="int16")
+    return decode_wav(blob)
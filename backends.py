@@ -0,0 +1,155 @@
+import hashlib
+import time
+from contextlib import nullcontext
+
+
+class SynthesisBackend:
+    """Turns text into 16-bit PCM. Subclasses implement synthesize and list_voices."""
+
+    name = None
+    cache_tag = None  # Part of the cache key so backends never share cached audio
+    billable = True  # Whether characters sent count towards the monthly quota
+    requests_per_second = None  # Overrides the setting for backends that rate-limit; 0 = unlimited
+    metrics = None
+
+    def _span(self, name):
+        return self.metrics.span(name) if self.metrics is not None else nullcontext()
+
+    def synthesize(self, text, lang_code, voice_id):
+        raise NotImplementedError
+
+    def list_voices(self, lang_code=None):
+        raise NotImplementedError
+
+    def warm_up_async(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class GoogleBackend(SynthesisBackend):
+    name = "google"
+    cache_tag = "LINEAR16"
+
+    def __init__(self, settings):
+        from clients import ClientManager
+
+        self.settings = settings
+        self.clients = ClientManager()
+
+    def _client(self):
+        return self.clients.get(self.settings.google_api_json)
+
+    def _limiter(self):
+        # Quotas are per project, so everything using the same credentials shares one limiter
+        from ratelimit import shared_limiter
+        rate = self.requests_per_second if self.requests_per_second is not None else self.settings.requests_per_second
+        return shared_limiter(self.settings.google_api_json, rate, self.settings.synthesis_workers)
+
+    def synthesize(self, text, lang_code, voice_id):
+        from google.api_core.exceptions import ResourceExhausted
+        from google.cloud import texttospeech
+        from audio import decode_wav
+
+        input_text = texttospeech.SynthesisInput(text=text)
+        voice_params = texttospeech.VoiceSelectionParams(
+            language_code=lang_code,
+            name=voice_id,
+        )
+        audio_config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.LINEAR16)
+
+        with self._span("client_acquire"):
+            client = self._client()
+        limiter = self._limiter()
+        attempt = 0
+        while True:
+            with self._span("rate_limit_wait"):
+                limiter.acquire()
+            try:
+                with self._span("grpc_request"):
+                    response = client.synthesize_speech(
+                        input=input_text,
+                        voice=voice_params,
+                        audio_config=audio_config,
+                    )
+            except ResourceExhausted:
+                # Rejected requests aren't billed, so wait and try again
+                attempt += 1
+                if attempt > self.settings.max_retries:
+                    raise
+                limiter.throttled()
+                continue
+            limiter.succeeded()
+            break
+        with self._span("decode"):
+            data, fs = decode_wav(response.audio_content)
+        return data, fs
+
+    def list_voices(self, lang_code=None):
+        response = self._client().list_voices(language_code=lang_code or "")
+        return [
+            {
+                "name": voice.name,
+                "language_codes": list(voice.language_codes),
+                "gender": voice.ssml_gender.name,
+                "sample_rate": voice.natural_sample_rate_hertz,
+            }
+            for voice in response.voices
+        ]
+
+    def warm_up_async(self):
+        return self.clients.warm_up_async(self.settings.google_api_json)
+
+    def close(self):
+        self.clients.close()
+
+
+class FakeBackend(SynthesisBackend):
+    """Offline stand-in: deterministic tone plus noise, as long as the text would take to say."""
+
+    name = "fake"
+    cache_tag = "fake"
+    billable = False
+
+    def __init__(self, voices=None, latency=0.15, per_char_latency=0.0, sample_rate=24000, chars_per_second=15.0):
+        self.voices = voices
+        self.latency = latency
+        self.per_char_latency = per_char_latency
+        self.sample_rate = sample_rate
+        self.chars_per_second = chars_per_second
+
+    def synthesize(self, text, lang_code, voice_id):
+        import numpy as np
+
+        delay = self.latency + self.per_char_latency * len(text)
+        if delay > 0:
+            time.sleep(delay)
+
+        seed = int.from_bytes(hashlib.sha256(f"{voice_id}\x1f{text}".encode("utf-8")).digest()[:8], "little")
+        rng = np.random.default_rng(seed)
+        frames = max(1, int(len(text) / self.chars_per_second * self.sample_rate))
+        t = np.arange(frames, dtype=np.float32) / self.sample_rate
+        pitch = 110.0 + (seed % 220)
+        signal = 0.3 * np.sin(2 * np.pi * pitch * t) + 0.05 * rng.standard_normal(frames, dtype=np.float32)
+        return (signal * 32767).astype(np.int16), self.sample_rate
+
+    def list_voices(self, lang_code=None):
+        if self.voices is None:
+            return []
+        criteria = {"language_code": lang_code} if lang_code else {}
+        return [
+            dict(voice.to_dict(), gender=voice.gender or "SSML_VOICE_GENDER_UNSPECIFIED", sample_rate=self.sample_rate)
+            for voice in self.voices.find(**criteria)
+        ]
+
+
+BACKENDS = ("google", "fake")
+
+
+def create_backend(name, settings, voices=None):
+    if name == "google":
+        return GoogleBackend(settings)
+    if name == "fake":
+        return FakeBackend(voices, latency=settings.fake_latency)
+    raise ValueError(f"Unknown synthesis backend: {name}")
@@ -0,0 +1,258 @@
+"""Benchmark the synthesis-to-playback pipeline against the fake backend and a null audio sink.
+
+    python benchmark.py --sizes 10 100 1000 5000 --hit-ratios 0 0.5 0.9 --output bench.json
+    python benchmark.py --compare bench.json
+"""
+import argparse
+import json
+import platform
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+import settings as settings_module
+import tts as tts_module
+from playback import PlaybackBuffer
+from settings import SettingsManager
+from tts import TTSWorker
+from voices import load_catalog
+
+SENTENCE = "Line {} says the quick brown fox jumps over the lazy dog. "
+
+
+class NullOutputEngine:
+    """Stands in for OutputEngine: drains buffers on a thread instead of a sound card."""
+
+    def __init__(self, blocksize=512, speed=0.0):
+        self.blocksize = blocksize
+        self.speed = speed  # Multiple of real time; 0 drains as fast as possible
+
+    def play(self, fs, devices, volume=1.0, max_buffered_frames=None):
+        buffer = PlaybackBuffer(fs, volume, max_buffered_frames)
+        reader = buffer.add_reader(fs)
+        threading.Thread(target=self._drain, args=(buffer, reader), daemon=True).start()
+        return buffer
+
+    def _drain(self, buffer, reader):
+        out = np.empty(self.blocksize, dtype=np.float32)
+        block_seconds = self.blocksize / buffer.fs
+        while not reader.done:
+            if reader.read_into(out, buffer.gain):
+                if buffer.first_sample_time is None:
+                    buffer.first_sample_time = time.perf_counter()
+                if self.speed:
+                    time.sleep(block_seconds / self.speed)
+            elif buffer.closed and not reader.segments:
+                buffer._reader_done(reader)
+            else:
+                time.sleep(0.001)
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class NullDevices:
+    names = ["null"]
+    rescan_lock = None
+    before_rescan = None
+
+    def resolve(self, name):
+        return 0 if name == "null" else None
+
+    def request_rescan(self):
+        pass
+
+    def device_missing(self, name):
+        pass
+
+
+class BenchHost:
+    def __init__(self, settings, voices):
+        self.settings = settings
+        self.voices = voices
+        self.devices = NullDevices()
+        self.billed = 0
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def on_tts_finished(self, text_len, count_characters=True):
+        if count_characters:
+            with self._lock:
+                self.billed += text_len
+
+    def report_error(self, title, message):
+        self.errors.append(f"{title}: {message}")
+
+
+def make_text(chars, index):
+    text = ""
+    n = 0
+    while len(text) < chars:
+        text += SENTENCE.format(f"{index}-{n}")
+        n += 1
+    return text[:chars].strip()
+
+
+def percentiles(values):
+    if not values:
+        return None
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "mean": float(np.mean(values))}
+
+
+def isolate_appdata(folder):
+    # The worker keeps its settings, usage ledger and voice list in appdata; none of the user's may be read or touched
+    for module in (settings_module, tts_module):
+        module.get_appdata_folder = lambda: folder
+
+
+def build_worker(args):
+    settings = SettingsManager()
+    settings.save = lambda: None  # Overrides below are for this run only
+    settings.backend = "fake"
+    settings.fake_latency = args.latency
+    settings.cache_to_disk = False
+    settings.synthesis_workers = args.workers
+    host = BenchHost(settings, load_catalog())
+    worker = TTSWorker(host, backend="fake")
+    worker.backend.per_char_latency = args.per_char_latency
+    worker.engine = NullOutputEngine(speed=args.sink_speed)
+    return host, worker
+
+
+def run_scenario(args, size, hit_ratio, depth):
+    host, worker = build_worker(args)
+    lang, voice = "English-UK", "Leda"
+    rng = random.Random(size * 1000 + int(hit_ratio * 100) + depth)
+
+    # Warm the cache with the phrases that count as hits
+    pool = [make_text(size, -(i + 1)) for i in range(max(1, args.repeats // 4))]
+    for text in pool:
+        for _, future in worker.synthesize(text, lang, voice):
+            future.result()
+
+    texts = [rng.choice(pool) if rng.random() < hit_ratio else make_text(size, i) for i in range(args.repeats)]
+    ttfs = []
+    e2e = []
+    tracemalloc.reset_peak()
+    cpu_start = time.process_time()
+    for start in range(0, len(texts), depth):
+        batch = []
+        for text in texts[start:start + depth]:
+            submitted = time.perf_counter()
+            batch.append((submitted, worker.speak(text, lang, voice, "null")))
+        for submitted, job in batch:
+            job.finished.wait()
+            done = time.perf_counter()
+            e2e.append(done - submitted)
+            first = job.buffer.first_sample_time if job.buffer is not None else None
+            if first is not None:
+                ttfs.append(first - submitted)
+    cpu_seconds = time.process_time() - cpu_start
+    _, peak = tracemalloc.get_traced_memory()
+    worker.close()
+
+    stats = worker.cache.stats()
+    lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+    return {
+        "text_chars": size,
+        "hit_ratio": hit_ratio,
+        "queue_depth": depth,
+        "utterances": len(texts),
+        "time_to_first_sample": percentiles(ttfs),
+        "end_to_end": percentiles(e2e),
+        "cpu_seconds": cpu_seconds,
+        "peak_memory_bytes": peak,
+        "chunk_hit_ratio": (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0,
+        "stages": worker.metrics.snapshot(),
+        "errors": host.errors,
+    }
+
+
+def scenario_key(result):
+    return (result["text_chars"], result["hit_ratio"], result["queue_depth"])
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r") as f:
+        baseline = {scenario_key(r): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path} (p50 / p95, + is slower):")
+    for result in results:
+        old = baseline.get(scenario_key(result))
+        if old is None:
+            continue
+        parts = []
+        for metric in ("time_to_first_sample", "end_to_end"):
+            new_stats, old_stats = result[metric], old[metric]
+            if not new_stats or not old_stats:
+                continue
+            deltas = [(new_stats[p] - old_stats[p]) / old_stats[p] * 100 if old_stats[p] else 0.0 for p in ("p50", "p95")]
+            parts.append(f"{metric} {deltas[0]:+.1f}% / {deltas[1]:+.1f}%")
+        print(f"  {scenario_key(result)}: " + ", ".join(parts))
+
+
+def print_result(result):
+    ttfs = result["time_to_first_sample"] or {}
+    e2e = result["end_to_end"] or {}
+    print(
+        f"{result['text_chars']:>5} chars  hit {result['hit_ratio']:.2f}  depth {result['queue_depth']:>2}  "
+        f"TTFS p50 {ttfs.get('p50', 0) * 1000:7.1f} ms  p95 {ttfs.get('p95', 0) * 1000:7.1f} ms  p99 {ttfs.get('p99', 0) * 1000:7.1f} ms  "
+        f"E2E p50 {e2e.get('p50', 0) * 1000:8.1f} ms  CPU {result['cpu_seconds']:.2f} s  "
+        f"peak {result['peak_memory_bytes'] / 1e6:.1f} MB"
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the Moon TTS synthesis-to-playback pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500, 1000, 5000], help="text lengths in characters")
+    parser.add_argument("--hit-ratios", type=float, nargs="+", default=[0.0, 0.5, 0.9], help="fraction of utterances served from cache")
+    parser.add_argument("--depths", type=int, nargs="+", default=[1, 4], help="utterances queued at once")
+    parser.add_argument("--repeats", type=int, default=20, help="utterances per scenario")
+    parser.add_argument("--workers", type=int, default=3, help="concurrent synthesis requests")
+    parser.add_argument("--latency", type=float, default=0.15, help="fake backend latency per request, seconds")
+    parser.add_argument("--per-char-latency", type=float, default=0.0002, help="fake backend latency per character, seconds")
+    parser.add_argument("--sink-speed", type=float, default=0.0, help="null sink playback speed as a multiple of real time, 0 = unthrottled")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = []
+    tracemalloc.start()
+    with tempfile.TemporaryDirectory() as appdata:
+        isolate_appdata(appdata)
+        for size in args.sizes:
+            for hit_ratio in args.hit_ratios:
+                for depth in args.depths:
+                    result = run_scenario(args, size, hit_ratio, depth)
+                    print_result(result)
+                    results.append(result)
+    tracemalloc.stop()
+
+    if args.output:
+        report = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "config": vars(args),
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
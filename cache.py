@@ -0,0 +1,196 @@
+import hashlib
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+from archive import PackedArchive
+from audio import decode_audio, encode_opus, encode_wav
+
+STORAGE_FORMATS = ("wav", "opus")
+COMPACT_DEAD_FRACTION = 0.25  # Compact once evicted audio takes this share of the disk budget
+
+
+def normalize_text(text):
+    # Whitespace differences don't change what gets spoken
+    return " ".join(text.split())
+
+
+def make_cache_key(text, lang_code, voice_id, audio_config="LINEAR16"):
+    raw = "\x1f".join((normalize_text(text), lang_code, voice_id, audio_config))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """Two-tier phrase cache: int16 PCM arrays in memory, WAV or Opus blobs in a packed archive on disk, both LRU."""
+
+    def __init__(self, folder, memory_limit_bytes=64 * 1024 * 1024, disk_limit_bytes=512 * 1024 * 1024, persist=True, storage_format="wav"):
+        if storage_format not in STORAGE_FORMATS:
+            raise ValueError(f"Unknown cache storage format: {storage_format}")
+        self.folder = folder
+        self.memory_limit_bytes = memory_limit_bytes
+        self.disk_limit_bytes = disk_limit_bytes
+        self.persist = persist
+        self.storage_format = storage_format
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (data, fs), most recently used last
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # key -> blob size, most recently used last
+        self._disk_bytes = 0
+
+        # --- Counters ---
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+
+        # Disk writes happen on a background thread, off the playback path
+        self._write_queue = queue.Queue()
+        self._writer = None
+
+        self._archive = PackedArchive(os.path.join(folder, "audio.pack"))
+        for key in self._archive.keys():
+            size = self._archive.size_of(key)
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry
+            on_disk = key in self._disk
+
+        if on_disk:
+            try:
+                data, fs = decode_audio(self._archive.get(key))
+            except Exception:
+                with self._lock:
+                    self._forget_disk(key)
+                    self._archive.delete(key)
+                    self.misses += 1
+                return None
+            with self._lock:
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                self.disk_hits += 1
+                self._store_memory(key, data, fs)
+            return data, fs
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def __contains__(self, key):
+        # Unlike get(), doesn't load anything or count as a hit
+        with self._lock:
+            return key in self._memory or key in self._disk
+
+    def put(self, key, data, fs):
+        with self._lock:
+            self._store_memory(key, data, fs)
+        if self.persist:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, daemon=True, name="audio-cache-writer")
+                self._writer.start()
+            self._write_queue.put((key, data, fs))
+
+    def flush(self):
+        self._write_queue.join()
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._write_queue.put(None)
+        self._archive.close()
+
+    def _write_loop(self):
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                self._write_queue.task_done()
+                return
+            key, data, fs = item
+            try:
+                encode = encode_opus if self.storage_format == "opus" else encode_wav
+                self.put_file(key, encode(data, fs))
+            except Exception:
+                pass
+            finally:
+                self._write_queue.task_done()
+
+    def put_file(self, key, blob):
+        size = len(blob)
+        if size > self.disk_limit_bytes:
+            return
+        self._archive.put(key, blob)
+        with self._lock:
+            self._forget_disk(key)
+            self._disk[key] = size
+            self._disk_bytes += size
+            self._evict_disk()
+            compact = self._archive.should_compact(self.disk_limit_bytes * COMPACT_DEAD_FRACTION)
+        if compact:
+            self.compact()
+
+    def compact(self):
+        with self._lock:
+            order = list(self._disk)
+        # Rewritten in LRU order, so recency survives a restart
+        self._archive.compact(order)
+
+    def _store_memory(self, key, data, fs):
+        size = data.nbytes
+        if size > self.memory_limit_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= old[0].nbytes
+        self._memory[key] = (data, fs)
+        self._memory_bytes += size
+        while self._memory_bytes > self.memory_limit_bytes:
+            _, (evicted, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+            self.memory_evictions += 1
+
+    def _forget_disk(self, key):
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.disk_limit_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self.disk_evictions += 1
+            self._archive.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._archive.clear()
+            self._disk.clear()
+            self._disk_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_evictions": self.memory_evictions,
+                "disk_evictions": self.disk_evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "archive_dead_bytes": self._archive.dead_bytes,
+            }
@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+
+from google.cloud import texttospeech
+from google.oauth2 import service_account
+
+# Ping the connection while idle so the next Speak press doesn't pay a new TLS handshake
+CHANNEL_OPTIONS = [
+    ("grpc.max_send_message_length", -1),
+    ("grpc.max_receive_message_length", -1),
+    ("grpc.keepalive_time_ms", 300000),
+    ("grpc.keepalive_permit_without_calls", 1),
+]
+
+
+class ClientManager:
+    """Keeps one TextToSpeechClient per credentials file, rebuilt only when the file changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._cred_path = None
+        self._cred_mtime = None
+        self.warmup_seconds = None
+        self.last_error = None
+
+    def get(self, cred_path):
+        with self._lock:
+            mtime = self._mtime(cred_path)
+            if self._client is None or cred_path != self._cred_path or mtime != self._cred_mtime:
+                self._client = self._build(cred_path)
+                self._cred_path = cred_path
+                self._cred_mtime = mtime
+            return self._client
+
+    def warm_up(self, cred_path):
+        start = time.perf_counter()
+        try:
+            client = self.get(cred_path)
+            # A free call that forces the channel to connect and authenticate
+            client.list_voices(language_code="en-US")
+        except Exception as e:
+            self.last_error = e
+            return None
+        self.warmup_seconds = time.perf_counter() - start
+        self.last_error = None
+        return self.warmup_seconds
+
+    def warm_up_async(self, cred_path):
+        if not cred_path or not os.path.exists(cred_path):
+            return None
+        thread = threading.Thread(target=self.warm_up, args=(cred_path,), daemon=True, name="tts-client-warmup")
+        thread.start()
+        return thread
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                try:
+                    self._client.transport.close()
+                except Exception:
+                    pass
+            self._client = None
+            self._cred_path = None
+
+    def _build(self, cred_path):
+        if self._client is not None:
+            try:
+                self._client.transport.close()
+            except Exception:
+                pass
+        credentials = service_account.Credentials.from_service_account_file(cred_path)
+        transport_cls = texttospeech.TextToSpeechClient.get_transport_class("grpc")
+        channel = transport_cls.create_channel(credentials=credentials, options=CHANNEL_OPTIONS)
+        return texttospeech.TextToSpeechClient(transport=transport_cls(channel=channel))
+
+    @staticmethod
+    def _mtime(cred_path):
+        try:
+            return os.path.getmtime(cred_path)
+        except OSError:
+            return None
@@ -0,0 +1,130 @@
+import sys
+import threading
+import time
+
+# PortAudio's host API order on Windows is MME, DirectSound, ...; older versions always used DirectSound
+DEFAULT_WINDOWS_HOST_API = "Windows DirectSound"
+MIN_RESCAN_INTERVAL = 10.0  # Seconds between rescans; requests in between are folded into the next one
+
+
+class DeviceRegistry:
+    """Output devices keyed by host API and name, cached so playback never has to query PortAudio.
+
+    Errors and devices that have gone missing request a rescan, at most one per MIN_RESCAN_INTERVAL,
+    and an optional timer (`refresh_interval`, off when 0) looks for
+    hot-plugged devices. PortAudio only sees new devices after it is reinitialized, which closes every
+    open stream, so a rescan waits until `rescan_lock` (the worker's playback lock) is free and calls
+    `before_rescan` first.
+    """
+
+    def __init__(self, host_api="", refresh_interval=30.0, on_change=None):
+        self.host_api = host_api
+        self.refresh_interval = refresh_interval
+        self.on_change = on_change
+        self.rescan_lock = None
+        self.before_rescan = None
+        self.names = []  # Sorted output device names for the selected host API
+        self.host_apis = []  # Host APIs that have at least one output device
+        self._devices = {}  # (host API name, device name) -> device info
+        self._indices = {}  # device name -> PortAudio index, for the selected host API
+        self.active_host_api = None  # host_api, or the fallback used when it isn't available
+        self._seen = set()  # Every device name listed so far, so a stale saved name can't keep forcing rescans
+        self._last_rescan = 0.0
+        self._rescan = threading.Event()
+        self._stop = threading.Event()
+        self.refresh()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="device-registry")
+        self._thread.start()
+
+    def resolve(self, name):
+        """PortAudio index for an output device name, or None if it isn't connected."""
+        return self._indices.get(name)
+
+    def info(self, name):
+        return self._devices.get((self.active_host_api, name))
+
+    def set_host_api(self, host_api):
+        self.host_api = host_api
+        self._select()
+
+    def request_rescan(self):
+        self._rescan.set()
+
+    def device_missing(self, name):
+        """Called when a device name doesn't resolve; only one that was connected earlier is worth a rescan."""
+        if name in self._seen:
+            self.request_rescan()
+
+    def close(self):
+        self._stop.set()
+        self._rescan.set()
+
+    def refresh(self, rescan=False):
+        import sounddevice as sd
+        if rescan:
+            sd._terminate()
+            sd._initialize()
+
+        host_api_names = [api["name"] for api in sd.query_hostapis()]
+        devices = {}
+        for idx, device in enumerate(sd.query_devices()):
+            if device["max_output_channels"] <= 0:
+                continue
+            name = device["name"].strip()
+            key = (host_api_names[device["hostapi"]], name)
+            # Some drivers list the same endpoint twice; keep the first like the old device list did
+            if key not in devices:
+                devices[key] = dict(device, name=name, index=idx, hostapi_name=key[0])
+
+        self._devices = devices
+        self.host_apis = [api for api in host_api_names if any(k[0] == api for k in devices)]
+        self._select(sd)
+
+    def _select(self, sd=None):
+        if sd is None:
+            import sounddevice as sd
+        host_api = self.host_api
+        if host_api not in self.host_apis:
+            host_api = DEFAULT_WINDOWS_HOST_API if sys.platform == "win32" else None
+        if host_api not in self.host_apis:
+            default = sd.default.hostapi
+            host_api = sd.query_hostapis(default)["name"] if default >= 0 else None
+        if host_api not in self.host_apis:
+            host_api = self.host_apis[0] if self.host_apis else None
+
+        indices = {name: info["index"] for (api, name), info in self._devices.items() if api == host_api}
+        names = sorted(indices)
+        changed = names != self.names or indices != self._indices
+        # Swapped whole so readers on other threads never see a half-built table
+        self.active_host_api = host_api
+        self._indices = indices
+        self.names = names
+        self._seen.update(names)
+        if changed and self.on_change is not None:
+            self.on_change()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._rescan.wait(self.refresh_interval or None)
+            if self._stop.is_set():
+                break
+            wait = self._last_rescan + MIN_RESCAN_INTERVAL - time.monotonic()
+            if wait > 0 and self._stop.wait(wait):
+                break
+            lock = self.rescan_lock
+            if lock is not None and not lock.acquire(blocking=False):
+                # Playing; rather than cut the audio off, try again shortly
+                self._rescan.set()
+                self._stop.wait(1.0)
+                continue
+            try:
+                self._rescan.clear()
+                self._last_rescan = time.monotonic()
+                if self.before_rescan is not None:
+                    self.before_rescan()
+                self.refresh(rescan=True)
+            except Exception:
+                pass
+            finally:
+                if lock is not None:
+                    lock.release()
@@ -0,0 +1,126 @@
+from functools import lru_cache
+
+import numpy as np
+
+from audio import PCM_SCALE
+
+# ITU-R BS.1770 K-weighting (pre-filter shelf, then RLB high-pass), as biquads at 48 kHz
+K_WEIGHTING = (
+    ((1.53512485958697, -2.69169618940638, 1.19839281085285), (1.0, -1.69065929318241, 0.73248077421585)),
+    ((1.0, -2.0, 1.0), (1.0, -1.99004745483398, 0.99007225036621)),
+)
+K_WEIGHTING_RATE = 48000
+ABSOLUTE_GATE = -70.0  # LUFS
+RELATIVE_GATE = -10.0  # LU below the ungated level
+MAX_BOOST_DB = 12.0  # Don't drag near-silent clips up to the target
+PEAK_CEILING = 0.98
+
+
+@lru_cache(maxsize=16)
+def _k_weighting_response(n_fft, fs):
+    # Clips are padded to a handful of lengths, so each response is computed once
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / fs)
+    z = np.exp(-2j * np.pi * np.minimum(freqs, K_WEIGHTING_RATE / 2) / K_WEIGHTING_RATE)
+    response = np.ones(len(freqs))
+    for b, a in K_WEIGHTING:
+        response *= np.abs((b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z))
+    return response.astype(np.float32)
+
+
+def integrated_loudness(samples, fs):
+    """Gated loudness of a clip in LUFS, after BS.1770; None if it is silent.
+
+    The K-weighting is applied as a magnitude response in the frequency domain, which gives the
+    same block energies as the IIR filters without a per-sample Python loop.
+    """
+    x = np.multiply(samples, PCM_SCALE, dtype=np.float32)
+    if not len(x):
+        return None
+    # Padded to a power of two: odd lengths can take several times longer to transform
+    n_fft = 1 << (len(x) - 1).bit_length()
+    spectrum = np.fft.rfft(x, n_fft)
+    spectrum *= _k_weighting_response(n_fft, fs)
+    weighted = np.fft.irfft(spectrum, n_fft)[:len(x)]
+
+    # 400 ms blocks overlapping by 75%, from a running sum of the squared signal
+    block = int(0.4 * fs)
+    step = max(block // 4, 1)
+    energy = np.concatenate(([0.0], np.cumsum(weighted * weighted, dtype=np.float64)))
+    if len(x) <= block:
+        powers = np.array([energy[-1] / len(x)])
+    else:
+        starts = np.arange(0, len(x) - block + 1, step)
+        powers = (energy[starts + block] - energy[starts]) / block
+
+    with np.errstate(divide="ignore"):
+        levels = -0.691 + 10 * np.log10(powers)
+    gated = powers[levels > ABSOLUTE_GATE]
+    if not len(gated):
+        return None
+    threshold = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE
+    gated = powers[(levels > ABSOLUTE_GATE) & (levels > threshold)]
+    return -0.691 + 10 * np.log10(gated.mean())
+
+
+def normalization_gain(samples, fs, target):
+    """Linear gain that brings a clip to `target` LUFS, without boosting past MAX_BOOST_DB or clipping."""
+    loudness = integrated_loudness(samples, fs)
+    if loudness is None:
+        return 1.0
+    gain = 10 ** (min(target - loudness, MAX_BOOST_DB) / 20)
+    # Not np.abs: on int16 it wraps -32768 back to itself
+    peak = max(-int(samples.min()), int(samples.max())) * PCM_SCALE
+    if peak * gain > PEAK_CEILING:
+        gain = PEAK_CEILING / peak
+    return float(gain)
+
+
+def time_stretch(samples, fs, speed, frame_ms=30, tolerance_ms=8):
+    """Change the speaking rate without changing the pitch (WSOLA).
+
+    Each output frame is taken from near its nominal position in the input, shifted to the
+    offset that best continues the previous frame so the overlap-add doesn't smear the pitch.
+    """
+    x = np.asarray(samples, dtype=np.float32)
+    frame = int(fs * frame_ms / 1000) // 2 * 2
+    if speed == 1.0 or len(x) < 2 * frame:
+        return x
+    hop = frame // 2
+    tolerance = int(fs * tolerance_ms / 1000)
+    # The search runs on a decimated copy; speech has little above 4 kHz worth aligning on
+    decimate = max(fs // 8000, 1)
+    window = np.hanning(frame + 1)[:frame].astype(np.float32)  # Periodic, so 50% overlaps sum to one
+
+    out_len = int(len(x) / speed)
+    frames = out_len // hop
+    padded = np.concatenate((np.zeros(tolerance, np.float32), x, np.zeros(frame + 2 * tolerance + int(hop * speed) + hop, np.float32)))
+    out = np.zeros(frames * hop + frame, np.float32)
+    previous = 0
+    for k in range(frames):
+        nominal = int(k * hop * speed)
+        if k == 0:
+            position = nominal
+        else:
+            natural = padded[previous + hop + tolerance:previous + hop + tolerance + frame:decimate]
+            region = padded[nominal:nominal + 2 * tolerance + frame:decimate]
+            offset = int(np.argmax(np.correlate(region, natural, "valid"))) * decimate
+            position = nominal - tolerance + offset
+        out[k * hop:k * hop + frame] += padded[position + tolerance:position + tolerance + frame] * window
+        previous = position
+    return out[:out_len]
+
+
+def apply_gain(samples, gain):
+    if gain == 1.0:
+        return samples
+    return np.multiply(samples, gain, dtype=np.float32)
+
+
+def trim_silence(samples, fs, threshold_db=-50.0, margin_ms=20):
+    """The clip without the leading and trailing silence the voice adds, so the pauses between clips can be set evenly."""
+    level = 10 ** (threshold_db / 20) / PCM_SCALE
+    loud = np.flatnonzero((samples > level) | (samples < -level))
+    if not len(loud):
+        return samples[:0]
+    margin = int(fs * margin_ms / 1000)
+    return samples[max(loud[0] - margin, 0):loud[-1] + margin + 1]
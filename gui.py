@@ -1,14 +1,20 @@
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
-from PIL import Image
 import os
+import queue
 import threading
-from tts import TTSWorker
+import traceback
+import startup
+from devices import DeviceRegistry
 from settings import SettingsManager
-from utils import resource_path, get_audio_devices
+from usage import voice_tier
+from utils import resource_path
+from voices import load_catalog
+
+UI_POLL_MS = 50  # How often the progress bar follows playback and queued UI updates are applied
 
 class MoonTTSApp:
-    def __init__(self, root):
+    def __init__(self, root, backend=None):
         self.root = root
         self.root.title("Moon TTS v1.0.0")
         self.root.geometry("400x570")
@@ -16,15 +22,87 @@ class MoonTTSApp:
         self.root.iconbitmap(resource_path("assets\\icon.ico"))
 
         # App state
-        self.settings = SettingsManager()
-        self.tts_worker = TTSWorker(self)
-        self.voice_data = self.settings.load_voice_data()
-        self.audio_devices, self.device_indices = get_audio_devices()
+        with startup.step("load settings and voices"):
+            self.settings = SettingsManager()
+            self.voices = load_catalog()
+        self.voices.on_change = lambda: self._post(self.update_voices)  # Discovered voices arrive in the background
+        self.backend_name = backend
+        # Filled in by the warm-up thread, so the window shows before audio and Google are loaded
+        self.tts_worker = None
+        self.devices = None
+        self.ready = threading.Event()
+        self._prefetch_after = None
+        # Other threads hand UI work to _poll_ui through this rather than touching widgets themselves
+        self._ui_queue = queue.Queue()
+        self._progress_active = False
 
         # --- GUI Layout ---
-        self._build_gui()
-        self._load_settings_to_gui()
-        self.update_voices()
+        with startup.step("build widgets"):
+            self._build_gui()
+            self._load_settings_to_gui()
+            self.update_voices()
+
+        threading.Thread(target=self._warm_up, daemon=True, name="startup").start()
+        self._poll_ui()
+
+    def _post(self, callback):
+        self._ui_queue.put(callback)
+
+    def _poll_ui(self):
+        try:
+            while True:
+                try:
+                    callback = self._ui_queue.get_nowait()
+                except queue.Empty:
+                    break
+                # One failing callback mustn't take the rest of the queue, or the poller, with it
+                try:
+                    callback()
+                except Exception:
+                    traceback.print_exc()
+            self._show_progress(self.tts_worker.progress() if self.tts_worker is not None else None)
+        finally:
+            self.root.after(UI_POLL_MS, self._poll_ui)
+
+    def _warm_up(self):
+        try:
+            with startup.step("decode banner"):
+                from PIL import Image
+                banner = Image.open(resource_path("assets\\banner.png"))
+                banner.load()
+            self._post(lambda: self._show_banner(banner))
+
+            with startup.step("probe audio devices"):
+                devices = DeviceRegistry(self.settings.host_api, self.settings.device_refresh_seconds)
+            devices.on_change = lambda: self._post(self._on_devices_ready)
+            self.devices = devices
+            self._post(self._on_devices_ready)
+
+            with startup.step("import tts"):
+                from tts import TTSWorker
+            with startup.step("create tts worker"):
+                self.tts_worker = TTSWorker(self, self.backend_name)
+            self.tts_worker.backend.warm_up_async()
+            self._post(self.update_total_characters_used_label)
+        except Exception as e:
+            self.report_error("Startup Error", str(e))
+        finally:
+            self.ready.set()
+
+    def _show_banner(self, image):
+        self.banner_label.configure(image=ctk.CTkImage(light_image=image, size=(400, 90)))
+
+    def _on_devices_ready(self):
+        # Also called whenever a rescan finds devices added or removed
+        names = self.devices.names
+        self.device_combo.configure(values=names)
+        self.device_combo2.configure(values=names)
+        self.host_api_combo.configure(values=self.devices.host_apis)
+        self.host_api_var.set(self.devices.active_host_api or "")
+        if self.selected_device_var.get() not in names:
+            self.selected_device_var.set(names[0] if names else "")
+        if self.monitor_device_var.get() not in names:
+            self.monitor_device_var.set(names[0] if names else "")
 
     def _build_gui(self):
         frame_1 = ctk.CTkFrame(self.root, width=400, height=600, fg_color='#E1DEE8')
@@ -32,10 +110,9 @@ class MoonTTSApp:
         frame_1.grid_columnconfigure((0, 1), weight=1)
         frame_1.grid_propagate(0)
 
-        # Banner
-        banner = ctk.CTkImage(light_image=Image.open(resource_path("assets\\banner.png")), size=(400, 90))
-        banner_label = ctk.CTkLabel(frame_1, text="", image=banner, width=400, height=90)
-        banner_label.grid(row=0, column=0, columnspan=2, pady=(0, 4))
+        # Banner, decoded in the background and filled in once ready
+        self.banner_label = ctk.CTkLabel(frame_1, text="", width=400, height=90)
+        self.banner_label.grid(row=0, column=0, columnspan=2, pady=(0, 4))
 
         # Credentials selector
         credentials_frame = ctk.CTkFrame(frame_1, fg_color="#E1DEE8")
@@ -66,7 +143,7 @@ class MoonTTSApp:
         language_label.grid(column=0, row=0, sticky='w', padx=(10, 0))
         self.language_combo = ctk.CTkComboBox(
             language_frame, width=110, variable=self.language_var,
-            values=list(self.voice_data.keys()), command=self.on_language_selected,
+            values=self.voices.languages, command=self.on_language_selected,
             border_color="#fff", fg_color="#fff", dropdown_fg_color="#fff", border_width=0, button_color="#fff"
         )
         self.language_combo.grid(column=1, row=0, pady=0, padx=(0, 10))
@@ -89,6 +166,10 @@ class MoonTTSApp:
         self.text_entry = ctk.CTkTextbox(frame_1, height=120, width=380, font=("Inter", 15), wrap="word")
         self.text_entry.grid(row=3, column=0, columnspan=2, pady=(0, 10), padx=10)
         self.text_entry.bind("<Return>", self.on_enter)
+        self.text_entry.bind("<Control-Return>", self.on_barge_in)
+        self.text_entry.bind("<KeyRelease>", self.on_text_changed)
+        self.root.bind("<Escape>", self.on_skip)
+        self.root.bind("<Shift-Escape>", self.on_clear_queue)
         self.text_entry.bind("<Control-v>", self._on_ctrl_v)
         self.text_entry.bind("<Button-1>", self._on_text_click)
 
@@ -106,6 +187,13 @@ class MoonTTSApp:
         # Device selection
         device_label = ctk.CTkLabel(frame_1, text="Audio Output:", font=("Inter", 20, "bold"), text_color="#393648")
         device_label.grid(row=5, column=0, columnspan=2, pady=(5, 0), sticky='w', padx=10)
+        self.host_api_var = ctk.StringVar()
+        self.host_api_combo = ctk.CTkComboBox(
+            frame_1, width=170, state="readonly", variable=self.host_api_var,
+            command=self.on_host_api_selected, border_color="#fff", fg_color="#fff",
+            dropdown_fg_color="#fff", border_width=0, button_color="#fff"
+        )
+        self.host_api_combo.grid(row=5, column=0, columnspan=2, pady=(5, 0), sticky='e', padx=10)
         self.selected_device_var = ctk.StringVar()
         self.device_combo = ctk.CTkComboBox(
             frame_1, width=400, state="readonly", variable=self.selected_device_var,
@@ -113,7 +201,6 @@ class MoonTTSApp:
             dropdown_fg_color="#fff", border_width=0, button_color="#fff"
         )
         self.device_combo.grid(row=6, column=0, columnspan=2, pady=0, padx=10)
-        self.device_combo.configure(values=self.audio_devices)
 
         # Monitor Section
         checkbox_frame = ctk.CTkFrame(frame_1, fg_color="#E1DEE8", height=24)
@@ -136,7 +223,6 @@ class MoonTTSApp:
             border_color="#fff", fg_color="#fff", dropdown_fg_color="#fff", border_width=0, button_color="#fff"
         )
         self.device_combo2.grid(row=8, column=0, columnspan=2, pady=0, padx=10)
-        self.device_combo2.configure(values=self.audio_devices)
 
         # Volume slider
         volume_frame = ctk.CTkFrame(frame_1, fg_color="#E1DEE8")
@@ -191,14 +277,9 @@ class MoonTTSApp:
         
         self.language_var.set(self.settings.selected_language)
         self.voice_var.set(self.settings.selected_voice)
-        if self.settings.selected_device in self.audio_devices:
-            self.selected_device_var.set(self.settings.selected_device)
-        else:
-            self.selected_device_var.set(self.audio_devices[0] if self.audio_devices else "")
-        if self.settings.monitor_device in self.audio_devices:
-            self.monitor_device_var.set(self.settings.monitor_device)
-        else:
-            self.monitor_device_var.set(self.audio_devices[0] if self.audio_devices else "")
+        # Checked against the real device list once probing finishes
+        self.selected_device_var.set(self.settings.selected_device or "")
+        self.monitor_device_var.set(self.settings.monitor_device or "")
         self.monitor_var.set(self.settings.monitor_enabled)
         self.volume_var.set(self.settings.volume)
         self.volume_percent_label.configure(text=f"{int(self.volume_var.get() * 100)}%")
@@ -207,15 +288,29 @@ class MoonTTSApp:
 
     def update_voices(self):
         lang_name = self.language_var.get()
-        if lang_name in self.voice_data:
-            voice_options = list(self.voice_data[lang_name]["voices"].keys())
+        voice_options = self.voices.voice_names(lang_name)
+        if voice_options:
             self.voice_combo.configure(values=voice_options)
             if self.voice_var.get() not in voice_options:
                 self.voice_var.set(voice_options[0])
 
     def update_total_characters_used_label(self):
-        usage_percentage = (self.settings.characters_used / self.settings.character_limit_per_month) * 100
-        self.total_used_label.configure(text=f"Total used this month: {self.settings.characters_used} / 1,000,000 ({usage_percentage:.2f}%)")
+        if self.tts_worker is None:
+            return  # Filled in once the worker and its usage ledger are up
+        usage = self.tts_worker.usage
+        language, voice = self.language_var.get(), self.voice_var.get()
+        tier = voice_tier(self.voices.voice_id(language, voice) if self.voices.has_voice(language, voice) else "")
+        used = usage.used(tier)
+        allowance = usage.allowance(tier)
+        usage_percentage = (used / allowance) * 100 if allowance else 0.0
+        text = f"Total used this month: {used} / {allowance:,} ({usage_percentage:.2f}%)"
+        latency = None
+        if self.settings.show_latency:
+            latency = self.tts_worker.metrics.last("time_to_first_sample")
+        if latency is not None:
+            # Time from pressing Speak to the first sample reaching the sound card
+            text += f" · {latency * 1000:.0f} ms"
+        self.total_used_label.configure(text=text)
 
     def on_language_selected(self, event=None):
         self.update_voices()
@@ -227,6 +322,12 @@ class MoonTTSApp:
     def on_device_selected(self, event=None):
         self._save_gui_settings()
 
+    def on_host_api_selected(self, value):
+        self.settings.host_api = value
+        if self.devices is not None:
+            self.devices.set_host_api(value)
+        self._save_gui_settings()
+
     def select_google_api_json(self):
         file_path = filedialog.askopenfilename(
             title="Select Google API Credentials JSON",
@@ -236,6 +337,8 @@ class MoonTTSApp:
             self.settings.google_api_json = file_path
             self.credentials_label.configure(text=os.path.basename(file_path))
             self._save_gui_settings()
+            if self.tts_worker is not None:
+                self.tts_worker.backend.warm_up_async()
 
     def toggle_monitor(self):
         if self.monitor_var.get():
@@ -252,36 +355,22 @@ class MoonTTSApp:
         else:
             self.topmost_button.configure(text="Pin on Top", fg_color="#fff", text_color="#393648", hover_color="#fff")
 
-    def speak_in_thread(self):
-        self.speak_button.configure(state="disabled")
+    def speak_in_thread(self, interrupt=False):
         text = self.text_entry.get("1.0", "end").strip()
         if not text:
             messagebox.showwarning("Warning", "Please enter some text.")
-            self.speak_button.configure(state="normal", text="Speak")
             return
-        if len(text) > self.settings.character_limit:
-            messagebox.showwarning("Warning", f"Text is too long! Max {self.settings.character_limit} characters.")
-            self.speak_button.configure(state="normal", text="Speak")
-            return
-
-        # CHECK FREE QUOTA LIMIT!
 
-        self.safety_margin = 10000
-
-        if (self.settings.characters_used + len(text)) > self.settings.character_limit_per_month or (self.settings.characters_used + len(text)) > (self.settings.character_limit_per_month - self.safety_margin):
+        # CHECK FREE QUOTA LIMIT! Falls back to a cheaper voice tier first when auto_downgrade is on
+        if self.tts_worker is not None and not self.tts_worker.has_quota(text, self.language_var.get(), self.voice_var.get()):
             messagebox.showwarning(
                 "Limit reached",
                 "You are about to exceed your monthly free quota for Google TTS.\n"
                 "No further requests will be sent to avoid charges."
             )
-            self.speak_button.configure(state="normal", text="Speak")
             return
 
-        threading.Thread(target=self._tts_and_play, args=(text,), daemon=True).start()
-
-    def _tts_and_play(self, text):
-        self.tts_worker.synthesize_and_play(
-            text,
+        request = dict(
             lang=self.language_var.get(),
             voice=self.voice_var.get(),
             output_device=self.selected_device_var.get(),
@@ -289,25 +378,72 @@ class MoonTTSApp:
             volume=self.volume_var.get()
         )
 
+        def speak():
+            if self.tts_worker is None:
+                return  # Startup failed and was already reported
+            # Queued on the worker, so the next line can be typed while this one plays
+            enqueue = self.tts_worker.interrupt if interrupt else self.tts_worker.speak
+            enqueue(text, **request)
+
+        if self.ready.is_set():
+            speak()
+        else:
+            # Pressed Speak before the warm-up finished; send it as soon as the worker exists
+            threading.Thread(target=lambda: (self.ready.wait(), self._post(speak)), daemon=True).start()
+
     def on_tts_finished(self, text_len, count_characters=True):
-        if count_characters:
-            self.settings.characters_used += text_len
-        self.root.after(0, lambda: [
+        # Characters are recorded in the usage ledger as they are synthesized; this just refreshes the display
+        self._post(lambda: [
             self.speak_button.configure(state="normal", text="Speak"),
             self.update_total_characters_used_label()
         ])
-        self._save_gui_settings()
+
+    def report_error(self, title, message):
+        def show():
+            from CTkMessagebox import CTkMessagebox
+            self.speak_button.configure(state="normal", text="Speak")
+            CTkMessagebox(title=title, message=message, icon="cancel", master=self.root)
+        self._post(show)
 
     def on_volume_change(self, value):
         self.settings.volume = value
         percent = int(float(value) * 100)
         self.volume_percent_label.configure(text=f"{percent}%")
+        if self.tts_worker is not None:
+            self.tts_worker.set_volume(float(value))
         self._save_gui_settings()
 
     def on_enter(self, event):
         self.speak_in_thread()
         return "break"
 
+    def on_barge_in(self, event):
+        self.speak_in_thread(interrupt=True)
+        return "break"
+
+    def on_skip(self, event=None):
+        if self.tts_worker is not None:
+            self.tts_worker.skip()
+
+    def on_clear_queue(self, event=None):
+        if self.tts_worker is not None:
+            self.tts_worker.clear()
+            self.tts_worker.skip()
+
+    def on_text_changed(self, event=None):
+        if not self.settings.prefetch_enabled or self.tts_worker is None:
+            return
+        # Wait for a pause in typing before synthesizing ahead
+        if self._prefetch_after is not None:
+            self.root.after_cancel(self._prefetch_after)
+        self._prefetch_after = self.root.after(self.settings.prefetch_delay_ms, self._prefetch)
+
+    def _prefetch(self):
+        self._prefetch_after = None
+        text = self.text_entry.get("1.0", "end").strip()
+        if text:
+            self.tts_worker.prefetch(text, self.language_var.get(), self.voice_var.get())
+
     def _on_ctrl_v(self, event):
         try:
             text = self.root.clipboard_get()
@@ -328,15 +464,25 @@ class MoonTTSApp:
         self.settings.volume = self.volume_var.get()
         self.settings.save()
 
-    def update_progress(self, value):
-        if value > 0:
-            # Active: set to color
-            self.progress_bar.configure(progress_color="#393648", fg_color="#C0BEC6")
-        else:
-            # Idle: set to gray
-            self.progress_bar.configure(progress_color="#C0BEC6", fg_color="#C0BEC6")
-        self.root.after(0, lambda: self.progress_var.set(value))
+    def _show_progress(self, value):
+        active = value is not None
+        if active != self._progress_active:
+            self._progress_active = active
+            if active:
+                # Active: set to color
+                self.progress_bar.configure(progress_color="#393648", fg_color="#C0BEC6")
+            else:
+                # Idle: set to gray
+                self.progress_bar.configure(progress_color="#C0BEC6", fg_color="#C0BEC6")
+        value = value if active else 0.0
+        if value != self.progress_var.get():
+            self.progress_var.set(value)
 
     def on_closing(self):
-        self.settings.save()
+        self._save_gui_settings()
+        if self.tts_worker is not None:
+            self.tts_worker.close()
+        if self.devices is not None:
+            self.devices.close()
+        self.settings.close()
         self.root.destroy()
\ No newline at end of file
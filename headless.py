@@ -0,0 +1,37 @@
+import logging
+
+from devices import DeviceRegistry
+from settings import SettingsManager
+from tts import TTSWorker
+from voices import load_catalog
+
+log = logging.getLogger("moontts")
+
+
+class HeadlessHost:
+    """Stands in for MoonTTSApp so TTSWorker can run without a Tk window."""
+
+    def __init__(self, backend=None, audio=True, workers=None):
+        self.settings = SettingsManager()
+        self.voices = load_catalog()
+        self.devices = None
+        if audio:
+            try:
+                self.devices = DeviceRegistry(self.settings.host_api, self.settings.device_refresh_seconds)
+            except OSError as e:
+                # No PortAudio: synthesis still works, only playback is unavailable
+                log.warning("Audio output unavailable: %s", e)
+        self.tts_worker = TTSWorker(self, backend, workers)
+        self.tts_worker.backend.warm_up_async()
+
+    def on_tts_finished(self, text_len, count_characters=True):
+        pass  # Usage is recorded in the worker's ledger as chunks are synthesized
+
+    def report_error(self, title, message):
+        log.error("%s: %s", title, message)
+
+    def close(self):
+        self.tts_worker.close()
+        if self.devices is not None:
+            self.devices.close()
+        self.settings.close()
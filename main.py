@@ -1,6 +1,8 @@
-from gui import MoonTTSApp
-import customtkinter as ctk
+import argparse
 import os
+import time
+import startup
+from backends import BACKENDS
 
 def get_credentials_path():
     # Check GOOGLE_APPLICATION_CREDENTIALS environment variable
@@ -8,9 +10,59 @@ def get_credentials_path():
     if cred_path:
         return cred_path
 
-if __name__ == "__main__":
+def parse_args():
+    parser = argparse.ArgumentParser(description="Moon TTS")
+    parser.add_argument("--serve", action="store_true", help="run headless and expose TTS over HTTP/WebSocket")
+    parser.add_argument("--host", default="127.0.0.1", help="address to bind in --serve mode")
+    parser.add_argument("--port", type=int, default=5150, help="port to bind in --serve mode")
+    parser.add_argument("--backend", choices=BACKENDS, help="synthesis backend, overriding the saved setting")
+    parser.add_argument("--profile-startup", action="store_true", help="print how long each startup step takes, then exit")
+    subparsers = parser.add_subparsers(dest="command")
+    render_parser = subparsers.add_parser("render", help="synthesize a script file into audio files")
+    from render import add_arguments
+    add_arguments(render_parser)
+    return parser.parse_args()
+
+def run_gui(backend=None):
+    with startup.step("import customtkinter"):
+        import customtkinter as ctk
+    with startup.step("import gui"):
+        from gui import MoonTTSApp
     ctk.set_appearance_mode("Light")
     ctk.set_default_color_theme("blue")
-    root = ctk.CTk()
-    app = MoonTTSApp(root)
-    root.mainloop()
\ No newline at end of file
+    with startup.step("create root window"):
+        root = ctk.CTk()
+    with startup.step("create app"):
+        app = MoonTTSApp(root, backend)
+    if startup.profiler is not None:
+        root.after_idle(lambda: report_startup(root, app))
+    root.mainloop()
+
+def report_startup(root, app):
+    startup.mark("window interactive")
+
+    def finish():
+        # Wait for the background warm-up too, so its steps make the report
+        if not app.ready.is_set():
+            root.after(20, finish)
+            return
+        startup.mark("warm-up finished")
+        print(startup.profiler.report())
+        app.on_closing()
+
+    finish()
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    args = parse_args()
+    if args.profile_startup:
+        startup.profiler = startup.StartupProfiler(started)
+        startup.profiler.record("parse arguments", started)
+    if args.command == "render":
+        from render import run_render
+        raise SystemExit(run_render(args))
+    elif args.serve:
+        from server import run_server
+        run_server(args.host, args.port, args.backend)
+    else:
+        run_gui(args.backend)
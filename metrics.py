@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Upper bounds in seconds, Prometheus style
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative bucket counts for export plus a rolling window of recent samples for percentiles."""
+
+    def __init__(self, window=512):
+        self.recent = deque(maxlen=window)
+        self.bucket_counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.recent.append(seconds)
+        self.count += 1
+        self.sum += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def snapshot(self):
+        snap = {"count": self.count, "sum": self.sum, "last": self.recent[-1] if self.recent else None}
+        if self.recent:
+            p50, p95, p99 = np.percentile(self.recent, [50, 95, 99])
+            snap.update(p50=float(p50), p95=float(p95), p99=float(p99))
+        return snap
+
+
+class Metrics:
+    """Named timing spans aggregated into rolling histograms."""
+
+    def __init__(self, window=512):
+        self.window = window
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self.window)
+            histogram.observe(seconds)
+
+    def last(self, name):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            return histogram.recent[-1] if histogram is not None and histogram.recent else None
+
+    def snapshot(self):
+        with self._lock:
+            return {name: h.snapshot() for name, h in self._histograms.items()}
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP moontts_stage_seconds Time spent in each stage of the TTS pipeline.",
+            "# TYPE moontts_stage_seconds histogram",
+        ]
+        with self._lock:
+            for name, h in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS, h.bucket_counts):
+                    cumulative += n
+                    lines.append(f'moontts_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'moontts_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {h.count}')
+                lines.append(f'moontts_stage_seconds_sum{{stage="{name}"}} {h.sum}')
+                lines.append(f'moontts_stage_seconds_count{{stage="{name}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """Periodically writes metrics to a local file, as Prometheus text or appended JSON lines."""
+
+    def __init__(self, metrics, path, fmt="prometheus", interval=15.0):
+        if fmt not in ("prometheus", "jsonl"):
+            raise ValueError(f"Unknown metrics format: {fmt}")
+        self.metrics = metrics
+        self.path = path
+        self.fmt = fmt
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="metrics-exporter")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=self.interval)
+        try:
+            self.export()
+        except OSError:
+            pass  # Shutting down regardless; the last export is best effort
+
+    def export(self):
+        if self.fmt == "prometheus":
+            # Rewritten in place for a node_exporter textfile collector, so swap it in atomically
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.write(self.metrics.prometheus_text())
+            os.replace(tmp_path, self.path)
+        else:
+            record = {"timestamp": time.time(), "stages": self.metrics.snapshot()}
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.export()
+            except OSError:
+                pass
@@ -0,0 +1,311 @@
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from audio import PCM_SCALE
+
+# sounddevice is imported where it's used: loading it fails outright on machines without PortAudio
+
+GAIN_SMOOTHING_SECONDS = 0.05  # Time constant for following the volume slider without zipper noise
+BLOCK_FRAMES = 4096  # Scratch space per reader; grown in the callback only if a host asks for more
+
+
+def resample(samples, src_rate, dst_rate):
+    if src_rate == dst_rate:
+        return samples
+    n_out = int(round(len(samples) * dst_rate / src_rate))
+    positions = np.linspace(0, len(samples) - 1, n_out)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+class _Reader:
+    """One device's cursor into a PlaybackBuffer. Only the audio callback reads from it."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.segments = deque()
+        self.offset = 0
+        self.frames_queued = 0  # Counted by the producer, so nobody walks the deque the callback pops from
+        self.frames_read = 0
+        self.done = False
+        # Where the latest block sits on the device clock, so progress tracks what is heard
+        self.block_start = 0
+        self.block_dac_time = None
+        # Gain actually applied, easing towards the buffer's gain, and preallocated ramp buffers
+        self.gain = None
+        self._steps = np.arange(1, BLOCK_FRAMES + 1, dtype=np.float32)
+        self._ramp = np.empty(BLOCK_FRAMES, dtype=np.float32)
+
+    def backlog(self):
+        return self.frames_queued - self.frames_read
+
+    def mark_block(self, dac_time):
+        self.block_start = self.frames_read
+        self.block_dac_time = dac_time
+
+    def frames_heard(self, now):
+        if self.block_dac_time is None:
+            return 0
+        heard = self.block_start + (now - self.block_dac_time) * self.rate
+        return min(max(heard, 0), self.frames_read)
+
+    def drain_time(self):
+        if self.block_dac_time is None:
+            return None
+        return self.block_dac_time + (self.frames_read - self.block_start) / self.rate
+
+    def read_into(self, out, gain):
+        n = len(out)
+        if self.gain is None:
+            self.gain = gain
+        # Once the gain has caught up with the slider it is folded into the copy, as a single pass
+        settled = self.gain == gain
+        scale = gain if settled else 1.0
+        written = 0
+        segments = self.segments
+        while written < n and segments:
+            seg = segments[0]
+            take = min(n - written, len(seg) - self.offset)
+            np.multiply(seg[self.offset:self.offset + take], scale, out=out[written:written + take], dtype=np.float32)
+            written += take
+            self.offset += take
+            if self.offset >= len(seg):
+                segments.popleft()
+                self.offset = 0
+        if written < n:
+            out[written:] = 0.0
+        if not settled:
+            self._ramp_gain(out, gain)
+        self.frames_read += written
+        return written
+
+    def _ramp_gain(self, out, target):
+        n = len(out)
+        current = self.gain
+        following = current + (target - current) * (1.0 - math.exp(-n / (GAIN_SMOOTHING_SECONDS * self.rate)))
+        if abs(following - target) < PCM_SCALE * 1e-4:
+            following = target
+        self.gain = following
+        if n > len(self._steps):
+            self._steps = np.arange(1, n + 1, dtype=np.float32)
+            self._ramp = np.empty(n, dtype=np.float32)
+        # Linear ramp across the block, built in place
+        ramp = self._ramp[:n]
+        np.multiply(self._steps[:n], (following - current) / n, out=ramp)
+        ramp += current
+        out *= ramp
+
+
+class PlaybackBuffer:
+    """Audio for one utterance, appended by the producer and drained by every attached device."""
+
+    def __init__(self, fs, volume=1.0, max_buffered_frames=None):
+        self.fs = fs
+        self.gain = float(volume) * PCM_SCALE  # Read by the callbacks on every block, so it can change mid-utterance
+        self.max_buffered_frames = max_buffered_frames
+        self.frames_written = 0
+        self.first_sample_time = None
+        self.closed = False
+        self.aborted = False
+        self.drain_time = None  # When the last sample reaches the speakers, once every device has taken it
+        self._readers = []
+        self._finished = threading.Event()
+
+    def set_volume(self, volume):
+        self.gain = float(volume) * PCM_SCALE
+
+    def add_reader(self, rate):
+        reader = _Reader(rate)
+        self._readers.append(reader)
+        return reader
+
+    def append(self, samples):
+        if self.aborted:
+            return
+        # Holding back the producer keeps memory bounded for long texts
+        # A reader whose stream died is done but never drains, so only live ones count
+        if self.max_buffered_frames is not None:
+            while not self.aborted and min((r.backlog() for r in self._readers if not r.done), default=0) > self.max_buffered_frames:
+                time.sleep(0.02)
+        for reader in self._readers:
+            if not reader.done:
+                segment = resample(samples, self.fs, reader.rate)
+                reader.segments.append(segment)
+                reader.frames_queued += len(segment)
+        self.frames_written += len(samples)
+
+    def close(self):
+        self.closed = True
+        self._check_finished()
+
+    def abort(self):
+        # The segments belong to the audio callbacks, which drop them once they see the reader is done
+        self.aborted = True
+        self.closed = True
+        for reader in self._readers:
+            reader.done = True
+        self._finished.set()
+
+    @property
+    def frames_played(self):
+        """Frames heard so far, going by each device's clock rather than how much it has been handed."""
+        if not self._readers:
+            return self.frames_written if self.closed else 0
+        now = time.perf_counter()
+        return max(r.frames_heard(now) * self.fs / r.rate for r in self._readers)
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        if not self._finished.wait(timeout):
+            return False
+        # The devices have taken the last block, but it is still in their buffers until it plays out
+        if self.drain_time is not None and not self.aborted:
+            remaining = self.drain_time - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+        return True
+
+    def _reader_done(self, reader, drain_time=None):
+        reader.done = True
+        if drain_time is not None and (self.drain_time is None or drain_time > self.drain_time):
+            self.drain_time = drain_time
+        self._check_finished()
+
+    def _check_finished(self):
+        if self.closed and all(r.done for r in self._readers):
+            self._finished.set()
+
+
+class _DeviceStream:
+    def __init__(self, device, rate, latency, on_error):
+        self.device = device
+        self.rate = rate
+        self.latency = latency
+        self.alive = True
+        self._on_error = on_error
+        self._current = None  # (buffer, reader)
+        import sounddevice as sd
+        self._stream = sd.OutputStream(
+            samplerate=rate, device=device, channels=1, dtype='float32',
+            latency=latency, callback=self._callback, finished_callback=self._stream_finished,
+        )
+        self._stream.start()
+        self._output_latency = self._stream.latency
+
+    def attach(self, buffer, reader):
+        previous = self._current
+        self._current = (buffer, reader)
+        if previous is not None and previous[0] is not buffer:
+            previous[0]._reader_done(previous[1])
+
+    def detach(self):
+        previous = self._current
+        self._current = None
+        if previous is not None:
+            previous[0]._reader_done(previous[1])
+
+    def _callback(self, outdata, frames, time_info, status):
+        current = self._current
+        if current is None:
+            outdata.fill(0)
+            return
+        buffer, reader = current
+        if reader.done:
+            outdata.fill(0)
+            reader.segments.clear()
+            self._current = None
+            return
+        # Some host APIs leave the DAC time at zero; fall back to the latency the stream reported
+        delay = time_info.outputBufferDacTime - time_info.currentTime
+        if delay <= 0 or delay > 1.0:
+            delay = self._output_latency
+        reader.mark_block(time.perf_counter() + delay)
+        if reader.read_into(outdata[:, 0], buffer.gain) and buffer.first_sample_time is None:
+            buffer.first_sample_time = reader.block_dac_time
+        if buffer.closed and not reader.segments:
+            self._current = None
+            buffer._reader_done(reader, reader.drain_time())
+
+    def _stream_finished(self):
+        if self.alive:
+            self.alive = False
+            self._on_error(self.device, RuntimeError("Output stream stopped unexpectedly"))
+        self.detach()
+
+    def close(self):
+        self.alive = False
+        try:
+            self._stream.abort()
+            self._stream.close()
+        except Exception as e:
+            self._on_error(self.device, e)
+        self.detach()
+
+
+class OutputEngine:
+    """Persistent output streams, one per device, fed from a shared PlaybackBuffer."""
+
+    def __init__(self, on_error=None):
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._on_error = on_error or (lambda device, error: None)
+
+    def play(self, fs, devices, volume=1.0, max_buffered_frames=None):
+        """Start an utterance on every (device, latency) pair and return its buffer for feeding."""
+        buffer = PlaybackBuffer(fs, volume, max_buffered_frames)
+        attached = []
+        with self._lock:
+            for device, latency in devices:
+                try:
+                    stream = self._stream_for(device, fs, latency)
+                except Exception as e:
+                    self._on_error(device, e)
+                    continue
+                attached.append((stream, buffer.add_reader(stream.rate)))
+        # Attach last so every device starts from the first frame together
+        for stream, reader in attached:
+            stream.attach(buffer, reader)
+        return buffer
+
+    def stop(self):
+        with self._lock:
+            for stream in self._streams.values():
+                stream.detach()
+
+    def close(self):
+        with self._lock:
+            for stream in self._streams.values():
+                stream.close()
+            self._streams.clear()
+
+    def _stream_for(self, device, fs, latency):
+        stream = self._streams.get(device)
+        if stream is not None and stream.alive and stream.latency == latency:
+            if stream.rate == fs or not self._supports(device, fs):
+                return stream
+        if stream is not None:
+            stream.close()
+            del self._streams[device]
+
+        rate = fs
+        if not self._supports(device, fs):
+            import sounddevice as sd
+            rate = int(sd.query_devices(device)['default_samplerate'])
+        stream = _DeviceStream(device, rate, latency, self._on_error)
+        self._streams[device] = stream
+        return stream
+
+    @staticmethod
+    def _supports(device, fs):
+        import sounddevice as sd
+        try:
+            sd.check_output_settings(device=device, samplerate=fs, channels=1, dtype='float32')
+            return True
+        except Exception:
+            return False
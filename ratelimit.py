@@ -0,0 +1,70 @@
+import random
+import threading
+import time
+
+BACKOFF_BASE = 1.0  # Seconds to hold off after the first throttled request, doubling after each one in a row
+BACKOFF_MAX = 30.0
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` acquisitions per second, with bursts up to `burst`.
+
+    When the server pushes back, throttled() pauses every caller with exponential backoff and
+    halves the rate; each success after that creeps it back towards the configured rate. A rate
+    of 0 leaves requests unlimited apart from that backoff.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.max_rate = max(float(rate), 0.0)
+        self.rate = self.max_rate
+        self.capacity = float(burst if burst is not None else max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._resume = 0.0  # No acquisitions before this time while backing off
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if now < self._resume:
+                    wait = self._resume - now
+                elif not self.rate:
+                    return
+                elif self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                else:
+                    wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self):
+        """Back off after a rejected request; returns how long callers will wait."""
+        with self._lock:
+            self._failures += 1
+            delay = min(BACKOFF_BASE * 2 ** (self._failures - 1), BACKOFF_MAX) * random.uniform(0.5, 1.0)
+            self._resume = max(self._resume, time.monotonic() + delay)
+            self._tokens = 0.0
+            self.rate = max(self.rate / 2, self.max_rate / 16)
+            return delay
+
+    def succeeded(self):
+        with self._lock:
+            self._failures = 0
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+def shared_limiter(name, rate, burst=None):
+    """The process-wide limiter for `name` (e.g. a credentials file), so every user of it shares the quota."""
+    with _shared_lock:
+        limiter = _shared.get(name)
+        if limiter is None or limiter.max_rate != max(float(rate), 0.0):
+            limiter = _shared[name] = RateLimiter(rate, burst)
+        return limiter
@@ -0,0 +1,232 @@
+"""Render a script file to audio files offline.
+
+    python main.py render script.csv --out renders --workers 6 --rate 8 --format ogg
+
+Scripts are plain text (one utterance per line), CSV with a header, or JSON lines. CSV and
+JSONL rows carry "text" and optionally "language", "voice" and "id". Finished lines are
+recorded in manifest.jsonl in the output folder, so an interrupted run picks up where it
+stopped.
+"""
+import csv
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+FORMATS = ("wav", "ogg", "opus")
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def load_script(path, default_language, default_voice):
+    extension = os.path.splitext(path)[1].lower()
+    # utf-8-sig: Excel and Notepad start their UTF-8 files with a BOM, which would otherwise end up in the first column name
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if extension == ".csv":
+            rows = list(csv.DictReader(f))
+        elif extension in (".jsonl", ".ndjson"):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = [{"text": line} for line in f.read().splitlines()]
+
+    lines = []
+    for row in rows:
+        text = (row.get("text") or "").strip()
+        if not text:
+            continue
+        lines.append({
+            "index": len(lines),
+            "id": (row.get("id") or "").strip() or None,
+            "text": text,
+            "language": (row.get("language") or "").strip() or default_language,
+            "voice": (row.get("voice") or "").strip() or default_voice,
+        })
+    return lines
+
+
+def output_name(line, fmt):
+    if line["id"]:
+        stem = re.sub(r"[^\w.-]+", "_", line["id"]).strip("._") or f"{line['index']:05d}"
+    else:
+        stem = f"{line['index']:05d}"
+    return f"{stem}.{fmt}"
+
+
+def load_manifest(path):
+    done = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for raw in f:
+                try:
+                    entry = json.loads(raw)
+                except json.JSONDecodeError:
+                    continue  # A run killed mid-write can leave a partial last line
+                done[entry["index"]] = entry
+    return done
+
+
+def is_done(entry, line, out_dir, fmt):
+    return (
+        entry is not None
+        and entry["text"] == line["text"]
+        and entry["language"] == line["language"]
+        and entry["voice"] == line["voice"]
+        and entry["file"] == output_name(line, fmt)  # A rerun in another format, or with a new id, renders again
+        and os.path.exists(os.path.join(out_dir, entry["file"]))
+    )
+
+
+def write_audio(path, samples, fs, fmt):
+    from audio import encode_opus, encode_wav
+
+    tmp_path = path + ".part"
+    if fmt in ("wav", "opus"):
+        with open(tmp_path, "wb") as f:
+            f.write(encode_wav(samples, fs) if fmt == "wav" else encode_opus(samples, fs))
+    else:
+        import soundfile as sf
+        sf.write(tmp_path, samples, fs, format="OGG", subtype="VORBIS")
+    os.replace(tmp_path, path)
+
+
+class Renderer:
+    def __init__(self, host, out_dir, fmt="wav", workers=4, rate=None):
+        self.host = host
+        self.worker = host.tts_worker
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.workers = workers
+        if rate is not None:
+            self.worker.backend.requests_per_second = rate
+        self.manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+        self._manifest_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def validate(self, lines):
+        problems = []
+        voices = self.host.voices
+        for line in lines:
+            if line["language"] not in voices.languages:
+                problems.append(f"line {line['index'] + 1}: unknown language {line['language']!r}")
+            elif not voices.has_voice(line["language"], line["voice"]):
+                problems.append(f"line {line['index'] + 1}: unknown voice {line['voice']!r} for {line['language']}")
+        names = {}
+        for line in lines:
+            name = output_name(line, self.fmt)
+            if name in names:
+                problems.append(f"line {line['index'] + 1}: output {name} clashes with line {names[name] + 1}")
+            names[name] = line["index"]
+        return problems
+
+    def render(self, lines):
+        os.makedirs(self.out_dir, exist_ok=True)
+        done = load_manifest(self.manifest_path)
+        todo = [line for line in lines if not is_done(done.get(line["index"]), line, self.out_dir, self.fmt)]
+        skipped = len(lines) - len(todo)
+        if skipped:
+            print(f"Resuming: {skipped} of {len(lines)} lines already rendered")
+
+        results = {"rendered": 0, "failed": 0, "billed": 0}
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="render")
+        try:
+            futures = {executor.submit(self._render_line, line): line for line in todo}
+            for n, future in enumerate(as_completed(futures), 1):
+                line = futures[future]
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    results["failed"] += 1
+                    print(f"[{n}/{len(todo)}] line {line['index'] + 1} failed: {e}")
+                    continue
+                if entry is None:
+                    continue
+                results["rendered"] += 1
+                results["billed"] += entry["characters_billed"]
+                print(f"[{n}/{len(todo)}] {entry['file']} ({entry['duration']:.1f} s)")
+        except KeyboardInterrupt:
+            self._stop.set()
+            print("Interrupted; finished lines are in the manifest and will be skipped next run")
+            raise
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        return results
+
+    def _render_line(self, line):
+        import numpy as np
+
+        if self._stop.is_set():
+            return None
+        if not self.worker.has_quota(line["text"], line["language"], line["voice"]):
+            self._stop.set()
+            raise RuntimeError("monthly character quota reached; stopping")
+
+        pending = self.worker.synthesize(line["text"], line["language"], line["voice"])
+        parts = []
+        fs = None
+        billed = 0
+        try:
+            for _, future in pending:
+                data, chunk_fs, chunk_billed = future.result()
+                if fs is not None and chunk_fs != fs:
+                    raise RuntimeError(f"chunk sample rates differ ({fs} and {chunk_fs} Hz)")
+                fs = chunk_fs
+                billed += chunk_billed
+                parts.append(data)
+        except BaseException:
+            billed += self.worker.cancel_pending(pending[len(parts):])
+            raise
+        finally:
+            if billed:
+                self.host.on_tts_finished(billed)
+
+        samples = np.concatenate(parts)
+        name = output_name(line, self.fmt)
+        write_audio(os.path.join(self.out_dir, name), samples, fs, self.fmt)
+        entry = {
+            "index": line["index"],
+            "id": line["id"],
+            "text": line["text"],
+            "language": line["language"],
+            "voice": line["voice"],
+            "file": name,
+            "sample_rate": fs,
+            "duration": len(samples) / fs,
+            "characters_billed": billed,
+        }
+        with self._manifest_lock:
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return entry
+
+
+def add_arguments(parser):
+    parser.add_argument("script", help="script file: .txt, .csv or .jsonl")
+    parser.add_argument("--out", default="renders", help="output folder for audio files and manifest.jsonl")
+    parser.add_argument("--format", choices=FORMATS, default="wav", help="audio file format")
+    parser.add_argument("--workers", type=int, default=4, help="lines rendered concurrently")
+    parser.add_argument("--rate", type=float, help="max synthesis requests per second, 0 = unlimited (default: the requests_per_second setting)")
+    parser.add_argument("--language", help="default language for lines without one")
+    parser.add_argument("--voice", help="default voice for lines without one")
+
+
+def run_render(args):
+    from headless import HeadlessHost
+
+    host = HeadlessHost(args.backend, audio=False, workers=args.workers)
+    try:
+        settings = host.settings
+        lines = load_script(args.script, args.language or settings.selected_language, args.voice or settings.selected_voice)
+        renderer = Renderer(host, args.out, args.format, args.workers, args.rate)
+        problems = renderer.validate(lines)
+        if problems:
+            for problem in problems:
+                print(problem)
+            return 1
+        results = renderer.render(lines)
+        print(
+            f"Rendered {results['rendered']} lines, "
+            f"{results['failed']} failed, {results['billed']} characters billed"
+        )
+        return 1 if results["failed"] else 0
+    finally:
+        host.close()
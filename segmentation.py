@@ -0,0 +1,98 @@
+import re
+import unicodedata
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|(?<=[。！？।؟])\s*")
+CLAUSE_END = re.compile(r"(?<=[,;:،])\s+|(?<=[、，；])\s*")
+MAX_REQUEST_BYTES = 5000  # Google's limit is on UTF-8 bytes, which Indic scripts reach at a third of the characters
+JOINERS = "\u200c\u200d"
+
+
+def fits(text, max_chars, max_bytes=MAX_REQUEST_BYTES):
+    return len(text) <= max_chars and len(text.encode("utf-8")) <= max_bytes
+
+
+def _breaks_cluster(text, cut):
+    # Cutting before a vowel sign or other mark, or after a virama or joiner, splits a written syllable
+    if cut <= 0 or cut >= len(text):
+        return False
+    before, after = text[cut - 1], text[cut]
+    return (
+        unicodedata.category(after).startswith("M")
+        or after in JOINERS
+        or before in JOINERS
+        or unicodedata.combining(before) == 9
+    )
+
+
+def _hard_cut(text, max_chars, max_bytes):
+    # The longest prefix within both limits, then back to a space or at least a syllable boundary
+    limit = min(max_chars, len(text.encode("utf-8")[:max_bytes].decode("utf-8", "ignore")))
+    cut = text.rfind(" ", 0, limit + 1)
+    if cut > 0:
+        return cut
+    cut = limit
+    while cut > 1 and _breaks_cluster(text, cut):
+        cut -= 1
+    return cut
+
+
+def _split_long(piece, max_chars, max_bytes=MAX_REQUEST_BYTES):
+    if fits(piece, max_chars, max_bytes):
+        return [piece]
+    parts = []
+    current = ""
+    for clause in CLAUSE_END.split(piece):
+        if current and not fits(f"{current} {clause}", max_chars, max_bytes):
+            parts.append(current)
+            current = clause
+        else:
+            current = f"{current} {clause}" if current else clause
+    if current:
+        parts.append(current)
+
+    # Clauses that are still too long get cut at the last space that fits
+    result = []
+    for part in parts:
+        while not fits(part, max_chars, max_bytes):
+            cut = _hard_cut(part, max_chars, max_bytes)
+            result.append(part[:cut].strip())
+            part = part[cut:].strip()
+        if part:
+            result.append(part)
+    return result
+
+
+def split_sentences(text, max_chars=300, min_chars=20, max_bytes=MAX_REQUEST_BYTES):
+    """Split text into speakable chunks at sentence, then clause boundaries.
+
+    Any length of text can be split; each chunk stays within both max_chars and the API's
+    per-request byte limit.
+    """
+    chunks = []
+    for sentence in SENTENCE_END.split(text.strip()):
+        sentence = " ".join(sentence.split())
+        if not sentence:
+            continue
+        for piece in _split_long(sentence, max_chars, max_bytes):
+            # Very short fragments ("Ok.") are merged forward to save a request
+            if chunks and len(chunks[-1]) < min_chars and fits(f"{chunks[-1]} {piece}", max_chars, max_bytes):
+                chunks[-1] = f"{chunks[-1]} {piece}"
+            else:
+                chunks.append(piece)
+    return chunks
+
+
+def finished_chunks(text, max_chars=300, min_chars=20):
+    """The leading chunks of text still being typed that won't change as more is added."""
+    ends = list(SENTENCE_END.finditer(text))
+    if not ends:
+        return []
+    chunks = split_sentences(text[:ends[-1].start()], max_chars, min_chars)
+    if chunks and len(chunks[-1]) < min_chars:
+        chunks.pop()  # A short last sentence gets merged into whatever comes next
+    # Only keep what the whole text would chunk the same way, so the cache keys line up on Enter
+    full = split_sentences(text, max_chars, min_chars)
+    stable = 0
+    while stable < len(chunks) and stable < len(full) and chunks[stable] == full[stable]:
+        stable += 1
+    return chunks[:stable]
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+from contextlib import aclosing
+
+import numpy as np
+from aiohttp import WSMsgType, web
+
+from audio import encode_wav
+from headless import HeadlessHost
+
+
+class TTSServer:
+    def __init__(self, host):
+        self.host = host
+        self.worker = host.tts_worker
+
+    def create_app(self):
+        app = web.Application()
+        app.add_routes([
+            web.get("/voices", self.voices),
+            web.get("/devices", self.devices),
+            web.post("/synthesize", self.synthesize),
+            web.post("/speak", self.speak),
+            web.post("/skip", self.skip),
+            web.post("/clear", self.clear),
+            web.get("/stream", self.stream),
+            web.get("/metrics", self.metrics),
+        ])
+        app.on_cleanup.append(self._cleanup)
+        return app
+
+    async def _read_json(self, request):
+        try:
+            return await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="Request body must be JSON")
+
+    def _parse_request(self, payload):
+        if not isinstance(payload, dict):
+            raise web.HTTPBadRequest(text="Request must be a JSON object")
+        settings = self.host.settings
+        text = str(payload.get("text", "")).strip()
+        lang = payload.get("language", settings.selected_language)
+        voice = payload.get("voice", settings.selected_voice)
+        if not text:
+            raise web.HTTPBadRequest(text="Missing text")
+        if not self.host.voices.has_voice(lang, voice):
+            raise web.HTTPBadRequest(text=f"Unknown language/voice: {lang}/{voice}")
+        if not self.worker.has_quota(text, lang, voice):
+            raise web.HTTPTooManyRequests(text="Monthly free quota reached")
+        return text, lang, voice
+
+    async def _iter_chunks(self, text, lang, voice):
+        pending = await asyncio.to_thread(self.worker.synthesize, text, lang, voice)
+        billed = 0
+        consumed = 0
+        try:
+            for _, future in pending:
+                data, fs, chunk_billed = await asyncio.wrap_future(future)
+                consumed += 1
+                billed += chunk_billed
+                yield data, fs
+        finally:
+            billed += await asyncio.to_thread(self.worker.cancel_pending, pending[consumed:])
+            if billed:
+                self.host.on_tts_finished(billed, count_characters=True)
+
+    async def voices(self, request):
+        return web.json_response(self.host.voices.to_voice_data())
+
+    async def devices(self, request):
+        devices = self.host.devices
+        return web.json_response(devices.names if devices is not None else [])
+
+    async def synthesize(self, request):
+        payload = await self._read_json(request)
+        # Checking the quota plans the text, which can read the cache; keep that off the event loop
+        text, lang, voice = await asyncio.to_thread(self._parse_request, payload)
+        parts = []
+        fs = None
+        async with aclosing(self._iter_chunks(text, lang, voice)) as chunks:
+            async for data, fs in chunks:
+                parts.append(data)
+        return web.Response(body=encode_wav(np.concatenate(parts), fs), content_type="audio/wav")
+
+    async def speak(self, request):
+        if self.host.devices is None:
+            raise web.HTTPServiceUnavailable(text="Audio output is unavailable")
+        payload = await self._read_json(request)
+        text, lang, voice = await asyncio.to_thread(self._parse_request, payload)
+        settings = self.host.settings
+        monitor = settings.monitor_device if settings.monitor_enabled else None
+        try:
+            volume = float(payload.get("volume", settings.volume))
+        except (TypeError, ValueError):
+            raise web.HTTPBadRequest(text="Volume must be a number")
+        target = {
+            "output_device": payload.get("device", settings.selected_device),
+            "monitor_device": payload.get("monitor_device", monitor),
+            "volume": volume,
+        }
+        names = self.host.devices.names
+        if target["output_device"] is None:
+            raise web.HTTPBadRequest(text="No output device given or selected")
+        if target["output_device"] not in names:
+            raise web.HTTPBadRequest(text=f"Unknown output device: {target['output_device']}")
+        if target["monitor_device"] is not None and target["monitor_device"] not in names:
+            raise web.HTTPBadRequest(text=f"Unknown monitor device: {target['monitor_device']}")
+        if payload.get("interrupt"):
+            job = await asyncio.to_thread(self.worker.interrupt, text, lang, voice, **target)
+        else:
+            job = await asyncio.to_thread(self.worker.speak, text, lang, voice, priority=bool(payload.get("priority")), **target)
+        return web.json_response({"id": job.id, "queued": len(self.worker.queued())})
+
+    async def skip(self, request):
+        job = self.worker.skip()
+        return web.json_response({"skipped": job.id if job is not None else None})
+
+    async def clear(self, request):
+        return web.json_response({"cleared": self.worker.clear()})
+
+    async def metrics(self, request):
+        return web.Response(text=self.worker.metrics.prometheus_text(), content_type="text/plain")
+
+    async def stream(self, request):
+        # One JSON request per text message; audio comes back as raw s16le frames per chunk
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            try:
+                try:
+                    payload = msg.json()
+                except ValueError:
+                    raise web.HTTPBadRequest(text="Message must be JSON")
+                text, lang, voice = await asyncio.to_thread(self._parse_request, payload)
+                started = False
+                async with aclosing(self._iter_chunks(text, lang, voice)) as chunks:
+                    async for data, fs in chunks:
+                        if not started:
+                            await ws.send_json({"type": "start", "sample_rate": fs, "channels": 1, "format": "s16le"})
+                            started = True
+                        await ws.send_bytes(data.tobytes())
+                await ws.send_json({"type": "end"})
+            except web.HTTPException as e:
+                await ws.send_json({"type": "error", "status": e.status, "message": e.text})
+            except Exception as e:
+                await ws.send_json({"type": "error", "status": 500, "message": str(e)})
+        return ws
+
+    async def _cleanup(self, app):
+        await asyncio.to_thread(self.host.close)
+
+
+def run_server(host="127.0.0.1", port=5150, backend=None):
+    logging.basicConfig(level=logging.INFO)
+    server = TTSServer(HeadlessHost(backend))
+    web.run_app(server.create_app(), host=host, port=port)
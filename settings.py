@@ -1,14 +1,26 @@
 import json
 import os
+import threading
+import time
 from utils import get_appdata_folder, resource_path
 
+SAVE_DELAY = 0.5  # Quiet time before a burst of changes is written
+MAX_SAVE_DELAY = 2.0  # Upper bound, so a long slider drag still gets saved
+
 class SettingsManager:
     def __init__(self):
+        self._lock = threading.Lock()
+        self._save_cond = threading.Condition(self._lock)
+        self._write_lock = threading.Lock()
+        self._dirty_since = None
+        self._last_change = None
+        self._writer = None
+        self._closed = False
+
         self.settings_path = os.path.join(get_appdata_folder(), "usage.json")
-        self.character_limit = 5000
-        self.character_limit_per_month = 1000000
         self.safety_margin = 10000
-        self.characters_used = 0
+        self.auto_downgrade = True
+        self.characters_used = 0  # Only read, to carry over into the usage ledger
         self.selected_language = "English-UK"
         self.selected_voice = "Leda"
         self.selected_device = None
@@ -16,6 +28,34 @@ class SettingsManager:
         self.monitor_enabled = True
         self.google_api_json = resource_path("client_auth_moontts.json")
         self.volume = 1.0
+        self.cache_memory_mb = 64
+        self.cache_disk_mb = 512
+        self.cache_to_disk = True
+        self.cache_format = "wav"
+        self.synthesis_workers = 3
+        self.output_latency = "low"
+        self.device_latency = {}
+        self.host_api = ""
+        self.device_refresh_seconds = 0.0  # Periodic hot-plug rescans; off by default since each one reopens the streams
+        self.backend = "google"
+        self.fake_latency = 0.15
+        self.metrics_export = ""
+        self.metrics_path = ""
+        self.metrics_interval = 15.0
+        self.show_latency = False
+        self.prefetch_enabled = False
+        self.prefetch_delay_ms = 700
+        self.prefetch_budget = 50000
+        self.normalize_loudness = True
+        self.target_loudness = -18.0
+        self.playback_speed = 1.0
+        self.synthesis_lookahead = 8
+        self.sentence_pause_ms = 250
+        self.max_buffered_seconds = 30.0
+        self.requests_per_second = 15.0
+        self.max_retries = 4
+        self.voice_discovery = False
+        self.voice_cache_hours = 24.0
         self._load()
 
     def _load(self):
@@ -24,6 +64,7 @@ class SettingsManager:
                 with open(self.settings_path, "r") as f:
                     data = json.load(f)
                     self.characters_used = data.get("characters_used", 0)
+                    self.auto_downgrade = data.get("auto_downgrade", True)
                     self.selected_language = data.get("selected_language", "English-UK")
                     self.selected_voice = data.get("selected_voice", "Leda")
                     self.selected_device = data.get("last_selected_device", None)
@@ -31,12 +72,100 @@ class SettingsManager:
                     self.monitor_enabled = data.get("monitor_enabled", True)
                     self.google_api_json = data.get("google_api_json", self.google_api_json)
                     self.volume = data.get("volume", 1.0)
+                    self.cache_memory_mb = data.get("cache_memory_mb", 64)
+                    self.cache_disk_mb = data.get("cache_disk_mb", 512)
+                    self.cache_to_disk = data.get("cache_to_disk", True)
+                    self.cache_format = data.get("cache_format", "wav")
+                    self.synthesis_workers = data.get("synthesis_workers", 3)
+                    self.output_latency = data.get("output_latency", "low")
+                    self.device_latency = data.get("device_latency", {})
+                    self.host_api = data.get("host_api", "")
+                    self.device_refresh_seconds = data.get("device_refresh_seconds", 0.0)
+                    self.backend = data.get("backend", "google")
+                    self.fake_latency = data.get("fake_latency", 0.15)
+                    self.metrics_export = data.get("metrics_export", "")
+                    self.metrics_path = data.get("metrics_path", "")
+                    self.metrics_interval = data.get("metrics_interval", 15.0)
+                    self.show_latency = data.get("show_latency", False)
+                    self.prefetch_enabled = data.get("prefetch_enabled", False)
+                    self.prefetch_delay_ms = data.get("prefetch_delay_ms", 700)
+                    self.prefetch_budget = data.get("prefetch_budget", 50000)
+                    self.normalize_loudness = data.get("normalize_loudness", True)
+                    self.target_loudness = data.get("target_loudness", -18.0)
+                    self.playback_speed = data.get("playback_speed", 1.0)
+                    self.synthesis_lookahead = data.get("synthesis_lookahead", 8)
+                    self.sentence_pause_ms = data.get("sentence_pause_ms", 250)
+                    self.max_buffered_seconds = data.get("max_buffered_seconds", 30.0)
+                    self.requests_per_second = data.get("requests_per_second", 15.0)
+                    self.max_retries = data.get("max_retries", 4)
+                    self.voice_discovery = data.get("voice_discovery", False)
+                    self.voice_cache_hours = data.get("voice_cache_hours", 24.0)
             except Exception:
                 pass
 
     def save(self):
-        data = {
+        """Schedule a write off the calling thread; bursts of calls coalesce into one."""
+        with self._save_cond:
+            now = time.monotonic()
+            if self._dirty_since is None:
+                self._dirty_since = now
+            self._last_change = now
+            if self._writer is None and not self._closed:
+                self._writer = threading.Thread(target=self._write_loop, daemon=True, name="settings-writer")
+                self._writer.start()
+            self._save_cond.notify()
+
+    def flush(self):
+        """Write any pending changes now, on the calling thread."""
+        with self._write_lock:
+            with self._save_cond:
+                if self._dirty_since is None:
+                    return
+                self._dirty_since = None
+                data = self._to_dict()
+            try:
+                self._write(data)
+            except OSError:
+                # Keep it pending so the next save or flush tries again
+                with self._save_cond:
+                    if self._dirty_since is None:
+                        self._dirty_since = self._last_change = time.monotonic()
+
+    def close(self):
+        with self._save_cond:
+            self._closed = True
+            self._save_cond.notify()
+        self.flush()
+
+    def _write_loop(self):
+        while True:
+            with self._save_cond:
+                while not self._closed:
+                    if self._dirty_since is None:
+                        self._save_cond.wait()
+                        continue
+                    due = min(self._last_change + SAVE_DELAY, self._dirty_since + MAX_SAVE_DELAY)
+                    remaining = due - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._save_cond.wait(remaining)
+                if self._closed:
+                    return
+            self.flush()
+
+    def _write(self, data):
+        # Write then rename, so a crash mid-write can never leave a torn file that resets the quota
+        tmp_path = self.settings_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.settings_path)
+
+    def _to_dict(self):
+        return {
             "characters_used": self.characters_used,
+            "auto_downgrade": self.auto_downgrade,
             "selected_language": self.selected_language,
             "selected_voice": self.selected_voice,
             "last_selected_device": self.selected_device,
@@ -44,11 +173,32 @@ class SettingsManager:
             "monitor_enabled": self.monitor_enabled,
             "google_api_json": self.google_api_json,
             "volume": self.volume,
+            "cache_memory_mb": self.cache_memory_mb,
+            "cache_disk_mb": self.cache_disk_mb,
+            "cache_to_disk": self.cache_to_disk,
+            "cache_format": self.cache_format,
+            "synthesis_workers": self.synthesis_workers,
+            "output_latency": self.output_latency,
+            "device_latency": self.device_latency,
+            "host_api": self.host_api,
+            "device_refresh_seconds": self.device_refresh_seconds,
+            "backend": self.backend,
+            "fake_latency": self.fake_latency,
+            "metrics_export": self.metrics_export,
+            "metrics_path": self.metrics_path,
+            "metrics_interval": self.metrics_interval,
+            "show_latency": self.show_latency,
+            "prefetch_enabled": self.prefetch_enabled,
+            "prefetch_delay_ms": self.prefetch_delay_ms,
+            "prefetch_budget": self.prefetch_budget,
+            "normalize_loudness": self.normalize_loudness,
+            "target_loudness": self.target_loudness,
+            "playback_speed": self.playback_speed,
+            "synthesis_lookahead": self.synthesis_lookahead,
+            "sentence_pause_ms": self.sentence_pause_ms,
+            "max_buffered_seconds": self.max_buffered_seconds,
+            "requests_per_second": self.requests_per_second,
+            "max_retries": self.max_retries,
+            "voice_discovery": self.voice_discovery,
+            "voice_cache_hours": self.voice_cache_hours,
         }
-        with open(self.settings_path, "w") as f:
-            json.dump(data, f)
-
-    def load_voice_data(self):
-        voices_path = resource_path("voices.json")
-        with open(voices_path, "r", encoding="utf-8") as f:
-            return json.load(f)
\ No newline at end of file
@@ -0,0 +1,48 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+profiler = None  # Set by main.py --profile-startup
+
+
+class StartupProfiler:
+    """Records how long each import and init step takes on the way to an interactive window."""
+
+    def __init__(self, origin=None):
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.steps = []  # (name, start offset, duration, thread name)
+        self._lock = threading.Lock()
+
+    def record(self, name, start, end=None):
+        end = end if end is not None else time.perf_counter()
+        with self._lock:
+            self.steps.append((name, start - self.origin, end - start, threading.current_thread().name))
+
+    @contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start)
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.record(name, now, now)
+
+    def report(self):
+        lines = [f"{'at ms':>8} {'took ms':>8}  {'thread':<14} step"]
+        with self._lock:
+            steps = sorted(self.steps, key=lambda s: s[1])
+        for name, offset, duration, thread in steps:
+            lines.append(f"{offset * 1000:8.1f} {duration * 1000:8.1f}  {thread:<14} {name}")
+        return "\n".join(lines)
+
+
+def step(name):
+    return profiler.step(name) if profiler is not None else nullcontext()
+
+
+def mark(name):
+    if profiler is not None:
+        profiler.mark(name)
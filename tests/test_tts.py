@@ -0,0 +1,30 @@
+import settings as settings_module
+import tts as tts_module
+from benchmark import BenchHost, NullOutputEngine
+from settings import SettingsManager
+from tts import TTSWorker
+from voices import load_catalog
+
+
+def make_worker(tmp_path, monkeypatch):
+    for module in (settings_module, tts_module):
+        monkeypatch.setattr(module, "get_appdata_folder", lambda: str(tmp_path))
+    settings = SettingsManager()
+    settings.save = lambda: None
+    settings.fake_latency = 0.01
+    settings.cache_to_disk = False
+    worker = TTSWorker(BenchHost(settings, load_catalog()), backend="fake")
+    worker.engine = NullOutputEngine()
+    return worker
+
+
+def test_interrupt_while_idle_plays_the_line(tmp_path, monkeypatch):
+    worker = make_worker(tmp_path, monkeypatch)
+    try:
+        for _ in range(10):
+            job = worker.interrupt("Hello there.", "English-UK", "Leda", "null")
+            assert job.finished.wait(10)
+            assert not job.cancelled
+            assert job.buffer is not None and job.buffer.frames_written
+    finally:
+        worker.close()
@@ -1,130 +1,609 @@
-import sounddevice as sd
-import soundfile as sf
+import itertools
 import os
 import threading
-from CTkMessagebox import CTkMessagebox
-from google.cloud import texttospeech
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+import numpy as np
+from backends import create_backend
+from cache import AudioCache, make_cache_key
+from dsp import apply_gain, normalization_gain, time_stretch, trim_silence
+from metrics import Metrics, MetricsExporter
+from playback import OutputEngine
+from segmentation import finished_chunks, split_sentences
+from usage import QuotaExceeded, UsageLedger, voice_tier
 from utils import get_appdata_folder
 
+LOUDNESS_CACHE_ENTRIES = 4096
+
+
+class Utterance:
+    _ids = itertools.count(1)
+
+    def __init__(self, text, lang, voice, output_device, monitor_device=None, volume=1.0):
+        self.id = next(Utterance._ids)
+        self.text = text
+        self.lang = lang
+        self.voice = voice
+        self.output_device = output_device
+        self.monitor_device = monitor_device
+        self.volume = volume
+        self.pending = None  # [(chunk, future)] once synthesis has been started
+        self.error = None
+        self.buffer = None
+        self.chars_queued = 0  # Characters whose audio has been handed to the buffer
+        self.fully_queued = False
+        self.cancelled = False
+        self.created = time.perf_counter()
+        self.finished = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def cancel(self):
+        self.cancelled = True
+        if self.buffer is not None:
+            self.buffer.abort()
+        for _, future in self.pending or ():
+            future.cancel()
+
+
+class _Lookahead:
+    """Starts a text's chunks in order, no more than `size` beyond the first one still unfinished."""
+
+    def __init__(self, size):
+        self.size = max(int(size), 1)
+        self._waiting = deque()  # (index, start) for chunks not started yet
+        self._finished = set()
+        self._frontier = 0  # Every chunk before this one has finished
+        self._starting = False
+        self._lock = threading.Lock()
+
+    def add(self, index, start):
+        self._waiting.append((index, start))
+
+    def finished(self, index):
+        with self._lock:
+            self._finished.add(index)
+            while self._frontier in self._finished:
+                self._finished.discard(self._frontier)
+                self._frontier += 1
+        self.start()
+
+    def start(self):
+        # A chunk can finish inside its own start (a cache hit), so only one call does the starting;
+        # nesting would recurse once per chunk on a fully cached text
+        with self._lock:
+            if self._starting:
+                return
+            self._starting = True
+        while True:
+            with self._lock:
+                if not self._waiting or self._waiting[0][0] >= self._frontier + self.size:
+                    self._starting = False
+                    return
+                start = self._waiting.popleft()[1]
+            try:
+                start()
+            except BaseException:
+                with self._lock:
+                    self._starting = False
+                raise
+
+
+class _ChunkFuture(Future):
+    """Result of one chunk, with the key its audio is cached under."""
+
+    def __init__(self, cache_key):
+        super().__init__()
+        self.cache_key = cache_key
+
+
+def _copy_result(source, target, billed=True):
+    if not target.set_running_or_notify_cancel():
+        return
+    if source.cancelled():
+        target.set_exception(CancelledError())
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        data, fs, chars = source.result()
+        target.set_result((data, fs, chars if billed else 0))
+
 
 class TTSWorker:
-    def __init__(self, app):
+    def __init__(self, app, backend=None, workers=None):
         self.app = app
-        # --- Caching attributes for last TTS request ---
-        self._last_text = None
-        self._last_language = None
-        self._last_voice = None
-        self._last_audio_path = None
-        self._last_volume = None
+        settings = app.settings
+        self.cache = AudioCache(
+            os.path.join(get_appdata_folder(), "cache"),
+            memory_limit_bytes=int(settings.cache_memory_mb * 1024 * 1024),
+            disk_limit_bytes=int(settings.cache_disk_mb * 1024 * 1024),
+            persist=settings.cache_to_disk,
+            storage_format=settings.cache_format,
+        )
+        self.usage = UsageLedger(os.path.join(get_appdata_folder(), "usage"), settings.safety_margin)
+        if settings.characters_used:
+            # Older versions kept a single counter in usage.json
+            self.usage.migrate(settings.characters_used)
+            settings.characters_used = 0
+            settings.save()
+        self.metrics = Metrics()
+        self.backend = create_backend(backend or settings.backend, settings, app.voices)
+        self.backend.metrics = self.metrics
+        self.voices = app.voices
+        if settings.voice_discovery:
+            path = os.path.join(get_appdata_folder(), "voices_cache.json")
+            self.voices.refresh_if_stale(self.backend, path, settings.voice_cache_hours * 3600)
+        self.engine = OutputEngine(on_error=self._report_playback_error)
+        self._executor = ThreadPoolExecutor(max_workers=workers or settings.synthesis_workers, thread_name_prefix="tts-synth")
         self._playback_lock = threading.Lock()  # Ensure only one playback at a time
+        self._clip_gains = OrderedDict()  # cache key -> loudness normalization gain, most recently used last
+
+        # Reinitializing PortAudio closes every stream, so rescans wait for playback to be idle
+        self.devices = app.devices
+        if self.devices is not None:
+            self.devices.rescan_lock = self._playback_lock
+            self.devices.before_rescan = self.engine.close
+
+        # --- Utterance queue ---
+        self._queue = deque()
+        self._queue_cond = threading.Condition()
+        self._current = None
+        self._queue_thread = None
+        self._closed = False  # Tells the queue loop to exit once the current utterance is done
+        self._playing = None  # The utterance on the speakers, for progress()
+
+        # --- Speculative prefetch while typing ---
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-prefetch")
+        self._prefetch_lock = threading.RLock()  # Reentrant: cancelling runs done callbacks inline
+        self._prefetch_generation = 0
+        self._prefetching = {}  # cache key -> (future, chars), for chunks being synthesized ahead of Enter
+
+        # --- Single-flight: identical chunks requested at once share one request ---
+        self._flight_lock = threading.Lock()
+        self._in_flight = {}  # cache key -> [future of the one request for it, number of callers waiting]
+
+        self.exporter = None
+        if settings.metrics_export:
+            extension = "prom" if settings.metrics_export == "prometheus" else "jsonl"
+            path = settings.metrics_path or os.path.join(get_appdata_folder(), f"metrics.{extension}")
+            self.exporter = MetricsExporter(self.metrics, path, settings.metrics_export, settings.metrics_interval).start()
+
+    def close(self):
+        with self._queue_cond:
+            self._closed = True
+            self._queue_cond.notify_all()
+        self.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._prefetch_executor.shutdown(wait=False, cancel_futures=True)
+        if self.exporter is not None:
+            self.exporter.stop()
+        self.backend.close()
+        self.engine.close()
+        self.cache.close()
+        self.usage.close()
 
     def synthesize_and_play(self, text, lang, voice, output_device, monitor_device=None, volume=1.0):
+        job = Utterance(text, lang, voice, output_device, monitor_device, volume)
+        self._run(job)
+        return job
+
+    # --- Queue API ---
+
+    def speak(self, text, lang, voice, output_device, monitor_device=None, volume=1.0, priority=False):
+        job = Utterance(text, lang, voice, output_device, monitor_device, volume)
+        return self._enqueue(job, priority)
+
+    def interrupt(self, text, lang, voice, output_device, monitor_device=None, volume=1.0):
+        job = Utterance(text, lang, voice, output_device, monitor_device, volume)
+        return self._enqueue(job, priority=True, barge_in=True)
+
+    def _enqueue(self, job, priority, barge_in=False):
+        with self._queue_cond:
+            # Taken before the queue loop can wake up and make the new job current itself
+            interrupted = self._current if barge_in else None
+            if priority:
+                self._queue.appendleft(job)
+            else:
+                self._queue.append(job)
+            if self._queue_thread is None:
+                self._queue_thread = threading.Thread(target=self._queue_loop, daemon=True, name="tts-queue")
+                self._queue_thread.start()
+            self._queue_cond.notify()
+            ahead = self._queue[0] is job
+        if interrupted is not None:
+            interrupted.cancel()
+        if ahead:
+            # Next in line: synthesize now so it's ready when the current line ends
+            self._start_synthesis(job)
+        return job
+
+    def skip(self):
+        with self._queue_cond:
+            job = self._current
+        if job is not None:
+            job.cancel()
+        return job
+
+    def clear(self):
+        with self._queue_cond:
+            jobs = list(self._queue)
+            self._queue.clear()
+        for job in jobs:
+            self._discard(job)
+        return len(jobs)
+
+    def promote(self, utterance_id):
+        with self._queue_cond:
+            for job in self._queue:
+                if job.id == utterance_id:
+                    self._queue.remove(job)
+                    self._queue.appendleft(job)
+                    break
+            else:
+                return False
+        self._start_synthesis(job)
+        return True
+
+    def progress(self):
+        """How far through the playing utterance the listener is, 0-1, or None when idle.
+
+        Read from the device clock on each call, so the UI can poll it at whatever rate it draws.
+        """
+        job = self._playing
+        buffer = job.buffer if job is not None else None
+        if buffer is None or not job.chars_queued:
+            return None
+        total = buffer.frames_written
+        if not job.fully_queued:
+            # Total length is only known once every chunk is back, so extrapolate from what has arrived
+            total = total * len(job.text) / job.chars_queued
+        return min(buffer.frames_played / total, 0.99) if total else 0.0
+
+    def set_volume(self, volume):
+        """Change the volume of the playing and queued utterances; playback eases to it within a block or two."""
+        with self._queue_cond:
+            jobs = list(self._queue)
+        job = self._playing
+        if job is not None:
+            jobs.append(job)
+        for job in jobs:
+            job.volume = volume
+            if job.buffer is not None:
+                job.buffer.set_volume(volume)
+
+    def queued(self):
+        with self._queue_cond:
+            return list(self._queue)
+
+    def _queue_loop(self):
+        while True:
+            with self._queue_cond:
+                while not self._queue and not self._closed:
+                    self._queue_cond.wait()
+                if self._closed:
+                    return
+                job = self._queue.popleft()
+                self._current = job
+                upcoming = self._queue[0] if self._queue else None
+            if upcoming is not None:
+                self._start_synthesis(upcoming)
+            self._run(job)
+            with self._queue_cond:
+                self._current = None
+
+    def _discard(self, job):
+        job.cancel()
+        if job.pending is not None:
+            billed = self.cancel_pending(job.pending)
+            if billed:
+                self.app.on_tts_finished(billed, count_characters=True)
+        job.finished.set()
+
+    # --- Synthesis and playback ---
+
+    def _run(self, job):
         with self._playback_lock:
-            cache_hit = (
-                self._last_text == text and
-                self._last_language == lang and
-                self._last_voice == voice and
-                os.path.exists(self._last_audio_path)
-            )
-            if cache_hit:
-                data, fs = sf.read(self._last_audio_path, dtype='float32')
-                data = data * float(volume)
-                # Stop any previous playback before starting new one
-                sd.stop()
-                self._play_with_progress(data, fs, output_device, monitor_device, text_len=len(text), count_characters=False)
-                self._last_volume = volume
+            if job.cancelled:
+                job.finished.set()
                 return
-
+            self.metrics.observe("queue_wait", time.perf_counter() - job.created)
             try:
-                cred_path = self.app.settings.google_api_json
-                os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = cred_path
-                client = texttospeech.TextToSpeechClient()
-
-                lang_code = self.app.voice_data[lang]["code"]
-                voice_id = self.app.voice_data[lang]["voices"][voice]
-
-                input_text = texttospeech.SynthesisInput(text=text)
-                voice_params = texttospeech.VoiceSelectionParams(
-                    language_code=lang_code,
-                    name=voice_id,
-                )
-                audio_config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.LINEAR16)
-
-                response = client.synthesize_speech(
-                    input=input_text,
-                    voice=voice_params,
-                    audio_config=audio_config,
-                )
-
-                output_path = os.path.join(get_appdata_folder(), "output.wav")
-                with open(output_path, "wb") as out:
-                    out.write(response.audio_content)
-
-                data, fs = sf.read(output_path, dtype='float32')
-                data = data * float(volume)  # Apply volume
-
-                # Update cache
-                self._last_text = text
-                self._last_language = lang
-                self._last_voice = voice
-                self._last_audio_path = output_path
-                self._last_volume = volume
-
-                # Stop any previous playback before starting new one
-                sd.stop()
-                self._play_with_progress(data, fs, output_device, monitor_device, text_len=len(text), count_characters=True)
+                self._start_synthesis(job)
+                if job.error is not None:
+                    raise job.error
+                self._play_with_progress(job)
+            except CancelledError:
+                pass
             except Exception as e:
-                self.app.root.after(0, lambda: self.app.speak_button.configure(state="normal", text="Speak"))
-                self.app.root.after(0, lambda: self.app.progress_var.set(0.0))
-                from tkinter import messagebox
-                self.app.root.after(0, lambda: messagebox.showerror("TTS Error", f"Error: {e}"))
-
-    
-    def _play_with_progress(self, data, fs, output_device, monitor_device, text_len, count_characters):
-        duration = len(data) / fs
-        device_indices = self.app.device_indices
-        main_idx = device_indices.get(output_device)
-        mon_idx = device_indices.get(monitor_device) if monitor_device else None
-
-        def is_valid_output_device(dev_idx):
-            try:
-                info = sd.query_devices(dev_idx)
-                return info['max_output_channels'] > 0
-            except Exception:
-                return False
+                if not job.cancelled:
+                    self._report_tts_error(e)
+            finally:
+                job.finished.set()
+
+    def synthesize(self, text, lang, voice):
+        """Start synthesizing text and return [(chunk, future)]; futures resolve to (pcm, fs, billed chars).
+
+        Chunks are synthesized concurrently, but only a window ahead of the first one still
+        unfinished, so a long text never has all of its requests out at once.
+        """
+        lang_code, voice_id, plan = self._plan(text, lang, voice)
+        lookahead = _Lookahead(self.app.settings.synthesis_lookahead)
+        pending = []
+        for index, (chunk, key, _) in enumerate(plan):
+            future = _ChunkFuture(key)
+            lookahead.add(index, lambda future=future, chunk=chunk, key=key: self._start_chunk(future, chunk, key, lang_code, voice_id))
+            future.add_done_callback(lambda done, index=index: lookahead.finished(index))
+            pending.append((chunk, future))
+        # Playback starts as soon as the first one is back
+        lookahead.start()
+        return pending
 
-        def playback(dev_idx):
+    def _start_chunk(self, future, chunk, key, lang_code, voice_id):
+        if future.cancelled():
+            return
+        with self.metrics.span("cache_lookup"):
+            cached = self.cache.get(key)
+        if cached is not None:
+            if future.set_running_or_notify_cancel():
+                if self.backend.billable:
+                    self.usage.record(len(chunk), voice_id, cache_hit=True)
+                future.set_result((cached[0], cached[1], 0))
+            return
+        flight, owner = self._join_flight(chunk, key, lang_code, voice_id)
+        if not owner and self.backend.billable:
+            self.usage.record(len(chunk), voice_id, cache_hit=True)
+        # Only the caller that started the request is billed for it
+        flight.add_done_callback(lambda source: _copy_result(source, future, billed=owner))
+        future.add_done_callback(lambda done: done.cancelled() and self._leave_flight(key, flight))
+
+    def _join_flight(self, chunk, key, lang_code, voice_id):
+        """The request already under way for key, or a new one: (future, whether this call started it)."""
+        with self._flight_lock:
+            entry = self._in_flight.get(key)
+            if entry is not None:
+                entry[1] += 1
+                return entry[0], False
+            cached = self.cache.get(key) if key in self.cache else None
+            if cached is not None:
+                # Landed between the cache lookup and here
+                flight = Future()
+                flight.set_result((cached[0], cached[1], 0))
+                return flight, False
+            flight = self._adopt_prefetch(key)
+            if flight is None:
+                flight = self._executor.submit(self._synthesize_chunk, chunk, key, lang_code, voice_id)
+            self._in_flight[key] = [flight, 1]
+        flight.add_done_callback(lambda done: self._land(key, done))
+        return flight, True
+
+    def _leave_flight(self, key, flight):
+        # Everyone waiting on it was cancelled: don't send it if it hasn't gone out yet
+        with self._flight_lock:
+            entry = self._in_flight.get(key)
+            if entry is None or entry[0] is not flight:
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+        flight.cancel()
+
+    def _land(self, key, flight):
+        # The audio is in the cache by now, so later requests find it there
+        with self._flight_lock:
+            entry = self._in_flight.get(key)
+            if entry is not None and entry[0] is flight:
+                del self._in_flight[key]
+
+    def prefetch(self, text, lang, voice):
+        """Synthesize the finished sentences of text still being typed, so Enter mostly hits the cache."""
+        with self._prefetch_lock:
+            self._prefetch_generation += 1
+            generation = self._prefetch_generation
+        self._prefetch_executor.submit(self._prefetch, text, lang, voice, generation)
+
+    def _prefetch(self, text, lang, voice, generation):
+        if generation != self._prefetch_generation:
+            return  # Superseded by newer text before it got this far
+        try:
+            lang_code, voice_id, plan = self._plan_chunks(finished_chunks(text), lang, voice)
+        except QuotaExceeded:
+            return
+        budget = None
+        if self.backend.billable:
+            budget = self.app.settings.prefetch_budget - self.usage.speculative_used()
+
+        with self._prefetch_lock:
+            if generation != self._prefetch_generation:
+                return
+            if budget is not None:
+                budget -= sum(chars for _, chars in self._prefetching.values())
+            wanted = set()
+            for chunk, key, cached in plan:
+                if cached:
+                    continue
+                if key not in self._prefetching and key not in self._in_flight:
+                    if budget is not None:
+                        if len(chunk) > budget:
+                            break
+                        budget -= len(chunk)
+                    future = self._executor.submit(self._synthesize_chunk, chunk, key, lang_code, voice_id, True)
+                    self._prefetching[key] = (future, len(chunk))
+                    future.add_done_callback(lambda f, key=key: self._prefetch_done(key, f))
+                wanted.add(key)
+            # The text changed: drop queued work for sentences that are no longer there
+            for key, (future, _) in list(self._prefetching.items()):
+                if key not in wanted:
+                    future.cancel()
+
+    def _prefetch_done(self, key, future):
+        with self._prefetch_lock:
+            entry = self._prefetching.get(key)
+            if entry is not None and entry[0] is future:
+                del self._prefetching[key]
+
+    def _adopt_prefetch(self, key):
+        # Take over a chunk that is already being prefetched rather than request it twice
+        with self._prefetch_lock:
+            entry = self._prefetching.pop(key, None)
+        if entry is None or entry[0].cancelled():
+            return None
+        return entry[0]
+
+    def has_quota(self, text, lang, voice):
+        try:
+            self._plan(text, lang, voice)
+            return True
+        except QuotaExceeded:
+            return False
+
+    def _plan(self, text, lang, voice):
+        """Pick the voice, dropping to a cheaper tier near the free allowance, and look each chunk up in the cache."""
+        return self._plan_chunks(split_sentences(text), lang, voice)
+
+    def _plan_chunks(self, chunks, lang, voice):
+        lang_code = self.voices.code(lang)
+        voice_id = self.voices.voice_id(lang, voice)
+        plan = self._lookup(chunks, lang_code, voice_id)
+        if self.backend.billable:
+            # Only chunks that aren't cached cost anything
+            needed = sum(len(chunk) for chunk, _, cached in plan if not cached)
+            tier = voice_tier(voice_id)
+            if needed and not self.usage.has_room(tier, needed):
+                fallback = self.usage.pick_tier(tier, needed, self.app.settings.auto_downgrade)
+                if fallback is None:
+                    raise QuotaExceeded(
+                        "You are about to exceed your monthly free quota for Google TTS.\n"
+                        "No further requests will be sent to avoid charges."
+                    )
+                voice_id = self.voices.fallback(lang_code, fallback, voice_id)
+                plan = self._lookup(chunks, lang_code, voice_id)
+        return lang_code, voice_id, plan
+
+    def _lookup(self, chunks, lang_code, voice_id):
+        plan = []
+        for chunk in chunks:
+            key = make_cache_key(chunk, lang_code, voice_id, self.backend.cache_tag)
+            plan.append((chunk, key, key in self.cache))
+        return plan
+
+    def _start_synthesis(self, job):
+        with job._start_lock:
+            if job.pending is not None or job.cancelled:
+                return
             try:
-                sd.stop()
-                sd.play(data, fs, device=dev_idx)
-                sd.wait()
+                job.pending = self.synthesize(job.text, job.lang, job.voice)
             except Exception as e:
-                self.app.root.after(0, lambda: CTkMessagebox(
-                    title="Playback Error",
-                    message=f"Playback failed on device {dev_idx}: {e}",
-                    icon="cancel",
-                    master=self.app.root
-                ))
-
-        threads = []
-        if main_idx is not None and is_valid_output_device(main_idx):
-            threads.append(threading.Thread(target=playback, args=(main_idx,)))
-        if mon_idx is not None and is_valid_output_device(mon_idx):
-            threads.append(threading.Thread(target=playback, args=(mon_idx,)))
-        for t in threads:
-            t.start()
-
-        def progress_updater():
-            import time
-            update_interval = 0.1
-            total_steps = int(duration / update_interval)
-            for i in range(total_steps):
-                self.app.update_progress(i / total_steps)
-                time.sleep(update_interval)
-            self.app.update_progress(1.0)
-            self.app.on_tts_finished(text_len, count_characters)
-            self.app.update_progress(0.0)
-        threading.Thread(target=progress_updater, daemon=True).start()
-
-        for t in threads:
-            t.join()
\ No newline at end of file
+                job.error = e
+                job.pending = []
+
+    def _synthesize_chunk(self, text, key, lang_code, voice_id, speculative=False):
+        with self.metrics.span("synthesis"):
+            data, fs = self.backend.synthesize(text, lang_code, voice_id)
+        if self.backend.billable:
+            self.usage.record(len(text), voice_id, speculative=speculative)
+        self.cache.put(key, data, fs)
+        return data, fs, len(text) if self.backend.billable else 0
+
+    def _play_with_progress(self, job):
+        pending = job.pending
+        main_idx = self.devices.resolve(job.output_device)
+        mon_idx = self.devices.resolve(job.monitor_device) if job.monitor_device else None
+        if main_idx is None:
+            self.devices.device_missing(job.output_device)
+        if job.monitor_device and mon_idx is None:
+            self.devices.device_missing(job.monitor_device)
+
+        self._playing = job
+        buffer = None
+        billed_total = 0
+        consumed = 0
+        try:
+            # Blocks until the first chunk is available
+            with self.metrics.span("first_chunk_wait"):
+                _, fs, _ = pending[0][1].result()
+            with self.metrics.span("device_validation"):
+                devices = []
+                for name, dev_idx in ((job.output_device, main_idx), (job.monitor_device, mon_idx)):
+                    if dev_idx is not None and dev_idx not in (d for d, _ in devices):
+                        devices.append((dev_idx, self._latency_for(name)))
+            with self.metrics.span("stream_start"):
+                max_frames = int(fs * self.app.settings.max_buffered_seconds)
+                buffer = self.engine.play(fs, devices, job.volume, max_frames)
+            job.buffer = buffer
+            playback_start = time.perf_counter()
+            if job.cancelled:
+                buffer.abort()
+
+            pause = None
+            for chunk, future in pending:
+                if job.cancelled:
+                    break
+                data, chunk_fs, billed = future.result()
+                consumed += 1
+                billed_total += billed
+                if chunk_fs != fs:
+                    raise RuntimeError(f"Sample rate changed mid-utterance ({chunk_fs} != {fs})")
+                if pause is None:
+                    pause = np.zeros(int(fs * self.app.settings.sentence_pause_ms / 1000), dtype=np.int16)
+                else:
+                    buffer.append(pause)
+                buffer.append(self._prepare(data, fs, future.cache_key))
+                job.chars_queued += len(chunk)
+            job.fully_queued = True
+            buffer.close()
+            buffer.wait()  # Returns once the last sample has played out of the device, not just left the buffer
+            if not job.cancelled:
+                finished = time.perf_counter()
+                self.metrics.observe("playback", finished - playback_start)
+                self.metrics.observe("end_to_end", finished - job.created)
+                if buffer.first_sample_time is not None:
+                    self.metrics.observe("time_to_first_sample", buffer.first_sample_time - job.created)
+        except BaseException:
+            if buffer is not None:
+                buffer.abort()
+            raise
+        finally:
+            billed_total += self.cancel_pending(pending[consumed:])
+            self._playing = None
+            self.app.on_tts_finished(billed_total, count_characters=billed_total > 0)
+
+    def _prepare(self, data, fs, key):
+        """Loudness-normalize and time-stretch a clip for playback. The cached audio stays as synthesized."""
+        settings = self.app.settings
+        data = trim_silence(data, fs)  # The gaps between clips are added evenly by the caller
+        if settings.normalize_loudness:
+            gain = self._clip_gains.get(key)
+            if gain is None:
+                with self.metrics.span("loudness"):
+                    gain = normalization_gain(data, fs, settings.target_loudness)
+                self._clip_gains[key] = gain
+                if len(self._clip_gains) > LOUDNESS_CACHE_ENTRIES:
+                    self._clip_gains.popitem(last=False)
+            else:
+                self._clip_gains.move_to_end(key)
+            data = apply_gain(data, gain)
+        if settings.playback_speed != 1.0:
+            # Stretched locally, so a new speed never costs a new request
+            with self.metrics.span("time_stretch"):
+                data = time_stretch(data, fs, settings.playback_speed)
+        return data
+
+    def cancel_pending(self, pending):
+        # Chunks that were already sent are billed even if they never play
+        billed = 0
+        for _, future in pending:
+            if not future.cancel() and future.exception() is None:
+                billed += future.result()[2]
+        return billed
+
+    def _latency_for(self, device_name):
+        settings = self.app.settings
+        return settings.device_latency.get(device_name, settings.output_latency)
+
+    def _report_tts_error(self, e):
+        self.app.report_error("TTS Error", f"Error: {e}")
+
+    def _report_playback_error(self, dev_idx, e):
+        if self.devices is not None:
+            self.devices.request_rescan()
+        self.app.report_error("Playback Error", f"Playback failed on device {dev_idx}: {e}")
@@ -0,0 +1,196 @@
+import json
+import os
+import re
+import threading
+import time
+
+# Free characters per month for each voice tier, and the next cheaper tier to fall back to
+TIER_ALLOWANCES = {
+    "Chirp3-HD": 1_000_000,
+    "Studio": 100_000,
+    "Neural2": 1_000_000,
+    "WaveNet": 4_000_000,
+    "Standard": 4_000_000,
+}
+DOWNGRADES = {
+    "Chirp3-HD": "WaveNet",
+    "Studio": "WaveNet",
+    "Neural2": "WaveNet",
+    "WaveNet": "Standard",
+}
+TIER_NAMES = {"wavenet": "WaveNet", "neural2": "Neural2", "standard": "Standard", "studio": "Studio", "chirp3-hd": "Chirp3-HD"}
+TIER_PATTERN = re.compile(r"-(Chirp3-HD|Wavenet|WaveNet|Neural2|Standard|Studio)-", re.IGNORECASE)
+UNKNOWN_TIER = "Unknown"  # Not in TIER_ALLOWANCES, so it has no free allowance
+CHECKPOINT_EVERY = 100  # Records between checkpoints of the running totals
+
+
+class QuotaExceeded(RuntimeError):
+    pass
+
+
+def voice_tier(voice_id):
+    match = TIER_PATTERN.search(voice_id)
+    return TIER_NAMES[match.group(1).lower()] if match else UNKNOWN_TIER
+
+
+def month_of(timestamp):
+    return time.strftime("%Y-%m", time.localtime(timestamp))
+
+
+def fallback_voice(lang_code, tier, fallbacks=None):
+    """Voice to use in a cheaper tier: from voices.json "fallbacks" if listed, else the tier's "A" voice."""
+    if fallbacks and tier in fallbacks:
+        return fallbacks[tier]
+    token = "Wavenet" if tier == "WaveNet" else tier
+    return f"{lang_code}-{token}-A"
+
+
+class UsageLedger:
+    """Append-only record of characters sent for synthesis, one JSON-lines file per month.
+
+    Totals per tier are kept in memory as records are added. A checkpoint of the totals and
+    the file offset they cover lets startup read only the records added since, rather than
+    the whole month.
+    """
+
+    def __init__(self, folder, safety_margin=10000, allowances=None):
+        self.folder = folder
+        self.safety_margin = safety_margin
+        self.allowances = dict(TIER_ALLOWANCES, **(allowances or {}))
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        self._lock = threading.Lock()
+        self._file = None
+        self._month = None
+        self._since_checkpoint = 0
+        self.totals = {}  # tier -> billed characters this month
+        self.cache_hit_chars = 0
+        self.speculative_chars = 0  # Billed characters that were prefetched while typing
+        self._open_month(month_of(time.time()))
+
+    def _path(self, month, suffix=".jsonl"):
+        return os.path.join(self.folder, month + suffix)
+
+    def _open_month(self, month):
+        if self._file is not None:
+            self._write_checkpoint()
+            self._file.close()
+        self._month = month
+        self.totals = {}
+        self.cache_hit_chars = 0
+        self.speculative_chars = 0
+        self._since_checkpoint = 0
+
+        offset = 0
+        try:
+            with open(self._path(month, ".totals.json"), "r") as f:
+                checkpoint = json.load(f)
+            offset = checkpoint["offset"]
+            self.totals = checkpoint["totals"]
+            self.cache_hit_chars = checkpoint["cache_hit_chars"]
+            self.speculative_chars = checkpoint.get("speculative_chars", 0)
+        except (OSError, ValueError, KeyError):
+            offset = 0
+
+        path = self._path(month)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                if offset > os.fstat(f.fileno()).st_size:
+                    # The checkpoint is ahead of the file, so trust the records and rescan
+                    offset, self.totals, self.cache_hit_chars, self.speculative_chars = 0, {}, 0, 0
+                f.seek(offset)
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break  # Torn last record from a crash; it's overwritten below
+                    try:
+                        self._apply(json.loads(raw))
+                    except ValueError:
+                        pass
+                    offset += len(raw)
+                f.seek(0, os.SEEK_END)
+                torn = f.tell() > offset
+            if torn:
+                with open(path, "r+b") as f:
+                    f.truncate(offset)
+        self._file = open(path, "ab")
+
+    def _apply(self, record):
+        if record.get("cache_hit"):
+            self.cache_hit_chars += record["chars"]
+        else:
+            self.totals[record["tier"]] = self.totals.get(record["tier"], 0) + record["chars"]
+            if record.get("speculative"):
+                self.speculative_chars += record["chars"]
+
+    def _write_checkpoint(self):
+        checkpoint = {
+            "offset": self._file.tell(),
+            "totals": self.totals,
+            "cache_hit_chars": self.cache_hit_chars,
+            "speculative_chars": self.speculative_chars,
+        }
+        path = self._path(self._month, ".totals.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, path)
+        self._since_checkpoint = 0
+
+    def _roll_over(self, now):
+        month = month_of(now)
+        if month != self._month:
+            self._open_month(month)
+
+    def record(self, chars, voice_id, cache_hit=False, speculative=False):
+        now = time.time()
+        record = {"ts": round(now, 3), "chars": chars, "tier": voice_tier(voice_id), "voice": voice_id, "cache_hit": cache_hit}
+        if speculative:
+            record["speculative"] = True
+        with self._lock:
+            self._roll_over(now)
+            self._file.write((json.dumps(record) + "\n").encode("utf-8"))
+            self._file.flush()
+            self._apply(record)
+            self._since_checkpoint += 1
+            if self._since_checkpoint >= CHECKPOINT_EVERY:
+                self._write_checkpoint()
+
+    def used(self, tier):
+        with self._lock:
+            self._roll_over(time.time())
+            return self.totals.get(tier, 0)
+
+    def speculative_used(self):
+        with self._lock:
+            self._roll_over(time.time())
+            return self.speculative_chars
+
+    def allowance(self, tier):
+        return self.allowances.get(tier, 0)
+
+    def has_room(self, tier, chars):
+        return self.used(tier) + chars <= self.allowance(tier) - self.safety_margin
+
+    def pick_tier(self, tier, chars, downgrade=True):
+        """The first tier, starting at `tier` and moving to cheaper ones, with room for `chars`; None if none has."""
+        while tier is not None:
+            if self.has_room(tier, chars):
+                return tier
+            tier = DOWNGRADES.get(tier) if downgrade else None
+        return None
+
+    def migrate(self, characters_used):
+        """Carry over the single counter older versions kept in usage.json, as Chirp3 usage this month."""
+        with self._lock:
+            if characters_used and not self.totals:
+                record = {"ts": round(time.time(), 3), "chars": characters_used, "tier": "Chirp3-HD", "voice": "", "cache_hit": False, "migrated": True}
+                self._file.write((json.dumps(record) + "\n").encode("utf-8"))
+                self._file.flush()
+                self._apply(record)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._write_checkpoint()
+                self._file.close()
+                self._file = None
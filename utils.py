@@ -18,20 +18,3 @@ def get_appdata_folder():
     if not os.path.exists(app_folder):
         os.makedirs(app_folder)
     return app_folder
-
-def get_audio_devices():
-    import sounddevice as sd
-    devices = sd.query_devices()
-    output_devices = []
-    device_indices = {}
-    seen_device_keys = {}
-    for idx, device in enumerate(devices):
-        if device['max_output_channels'] > 0 and device['hostapi'] == 1:
-            original_name = device['name'].strip()
-            clean_key = original_name.lower()
-            if clean_key not in seen_device_keys:
-                output_devices.append(original_name)
-                device_indices[original_name] = idx
-                seen_device_keys[clean_key] = idx
-    output_devices.sort()
-    return output_devices, device_indices
\ No newline at end of file
@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+import time
+
+from usage import TIER_ALLOWANCES, fallback_voice, voice_tier
+
+# voices.json doesn't say; discovery fills these in for every other voice
+CHIRP3_GENDERS = {
+    "Aoede": "FEMALE", "Kore": "FEMALE", "Leda": "FEMALE", "Zephyr": "FEMALE",
+    "Charon": "MALE", "Fenrir": "MALE", "Orus": "MALE", "Puck": "MALE",
+}
+INDEXED = ("language_code", "tier", "gender", "sample_rate")
+
+
+class Voice:
+    def __init__(self, name, language_code, display_name, gender=None, sample_rate=None):
+        self.name = name  # The backend's voice id, e.g. en-GB-Chirp3-HD-Leda
+        self.language_code = language_code
+        self.display_name = display_name
+        self.tier = voice_tier(name)
+        self.gender = gender
+        self.sample_rate = sample_rate
+
+    def to_dict(self):
+        return {"name": self.name, "language_codes": [self.language_code], "gender": self.gender, "sample_rate": self.sample_rate}
+
+
+def display_name_for(voice_id, language_code):
+    rest = voice_id[len(language_code) + 1:] if voice_id.startswith(language_code + "-") else voice_id
+    return rest[len("Chirp3-HD-"):] if rest.startswith("Chirp3-HD-") else rest
+
+
+class VoiceCatalog:
+    """The languages and voices on offer, indexed for lookup by language code, display name, tier, gender and sample rate.
+
+    Starts from the curated voices.json. Voices discovered from the backend's list_voices are
+    cached on disk and merged in, adding other tiers and filling in genders and sample rates.
+    """
+
+    def __init__(self, languages, voices, fallbacks=None):
+        self.languages = list(languages)  # Display names in menu order
+        self._codes = dict(languages)  # display name -> language code
+        self._curated = list(voices)
+        self.fallbacks = fallbacks or {}  # language code -> {tier: voice id}, from voices.json
+        self.on_change = None
+        self._build(self._curated)
+
+    @classmethod
+    def from_voice_data(cls, data):
+        languages = {}
+        voices = []
+        fallbacks = {}
+        for language, entry in data.items():
+            code = entry["code"]
+            languages[language] = code
+            for display_name, voice_id in entry["voices"].items():
+                voices.append(Voice(voice_id, code, display_name, CHIRP3_GENDERS.get(display_name)))
+            if entry.get("fallbacks"):
+                fallbacks[code] = entry["fallbacks"]
+        return cls(languages, voices, fallbacks)
+
+    def _build(self, voices):
+        by_id = {}
+        by_language = {code: {} for code in self._codes.values()}
+        indexes = {field: {} for field in INDEXED}
+        for voice in voices:
+            if voice.name in by_id or voice.language_code not in by_language:
+                continue
+            by_id[voice.name] = voice
+            by_language[voice.language_code].setdefault(voice.display_name, voice)
+            for field in INDEXED:
+                indexes[field].setdefault(getattr(voice, field), []).append(voice)
+        # Swapped whole so lookups on other threads never see a half-built index
+        self._by_id, self._by_language, self._indexes = by_id, by_language, indexes
+
+    # --- Lookup ---
+
+    def code(self, language):
+        return self._codes[language]
+
+    def has_voice(self, language, display_name):
+        return language in self._codes and display_name in self._by_language[self._codes[language]]
+
+    def voice_names(self, language):
+        return list(self._by_language.get(self._codes.get(language), ()))
+
+    def voice_id(self, language, display_name):
+        return self._by_language[self._codes[language]][display_name].name
+
+    def voice(self, voice_id):
+        return self._by_id.get(voice_id)
+
+    def find(self, **criteria):
+        """Voices matching every given field of INDEXED, e.g. find(language_code="en-GB", tier="WaveNet")."""
+        indexes = self._indexes
+        lists = [indexes[field].get(value, []) for field, value in criteria.items()]
+        if not lists:
+            return list(self._by_id.values())
+        return [voice for voice in min(lists, key=len) if all(getattr(voice, field) == value for field, value in criteria.items())]
+
+    def fallback(self, language_code, tier, voice_id=None):
+        """Voice to use in a cheaper tier: voices.json's "fallbacks" if listed, then a discovered voice of the same gender."""
+        explicit = self.fallbacks.get(language_code)
+        if explicit and tier in explicit:
+            return explicit[tier]
+        candidates = self.find(language_code=language_code, tier=tier)
+        current = self._by_id.get(voice_id)
+        if current is not None and current.gender:
+            candidates = [v for v in candidates if v.gender == current.gender] or candidates
+        if candidates:
+            return candidates[0].name
+        return fallback_voice(language_code, tier)
+
+    def to_voice_data(self):
+        """The catalog in voices.json's shape, for clients of the HTTP API."""
+        return {
+            language: {"code": code, "voices": {name: voice.name for name, voice in self._by_language[code].items()}}
+            for language, code in self._codes.items()
+        }
+
+    # --- Discovery ---
+
+    def merge(self, discovered):
+        """Add voices from list_voices() for the catalog's languages, curated ones first."""
+        voices = []
+        known = {}
+        for entry in discovered:
+            # Voices from families the quota guard doesn't know (Journey, Polyglot, ...) could be billed unchecked
+            if voice_tier(entry["name"]) not in TIER_ALLOWANCES:
+                continue
+            for code in entry["language_codes"]:
+                if code in self._by_language:
+                    known.setdefault(entry["name"], entry)
+                    voices.append(Voice(entry["name"], code, display_name_for(entry["name"], code), entry.get("gender"), entry.get("sample_rate")))
+        for voice in self._curated:
+            entry = known.get(voice.name)
+            if entry is not None:
+                voice.gender = entry.get("gender") or voice.gender
+                voice.sample_rate = entry.get("sample_rate") or voice.sample_rate
+        self._build(self._curated + voices)
+        if self.on_change is not None:
+            self.on_change()
+
+    def load_cached(self, path, backend_name):
+        """Merge voices discovered earlier; returns when they were fetched, or None if there are none."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached["backend"] != backend_name:
+                return None
+            self.merge(cached["voices"])
+            return cached["fetched"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def refresh(self, backend, path):
+        voices = backend.list_voices()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"backend": backend.name, "fetched": time.time(), "voices": voices}, f)
+        os.replace(tmp_path, path)
+        self.merge(voices)
+
+    def refresh_if_stale(self, backend, path, max_age):
+        """Use the cached discovery, and fetch a new one in the background if it's older than max_age seconds."""
+        fetched = self.load_cached(path, backend.name)
+        if fetched is not None and time.time() - fetched < max_age:
+            return None
+
+        def run():
+            try:
+                self.refresh(backend, path)
+            except Exception:
+                pass  # Offline or no credentials yet; the curated voices still work
+
+        thread = threading.Thread(target=run, daemon=True, name="voice-discovery")
+        thread.start()
+        return thread
+
+
+def load_catalog():
+    from utils import resource_path
+    with open(resource_path("voices.json"), "r", encoding="utf-8") as f:
+        return VoiceCatalog.from_voice_data(json.load(f))